@@ -20,6 +20,7 @@ Usage:
 """
 
 import ast
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -585,8 +586,9 @@ def _extract_class_info(
     include_line_numbers: bool = True
 ) -> Dict[str, Any]:
     """Extract full information about a class."""
-    # Base classes
-    bases = [_get_name(b) for b in node.bases]
+    # Base classes; dotted names ("models.Model") are built fresh per class,
+    # so intern them to share one string across every class that uses them
+    bases = [sys.intern(_get_name(b)) for b in node.bases]
 
     # Docstring
     docstring = ast.get_docstring(node)
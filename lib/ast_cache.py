@@ -0,0 +1,78 @@
+"""
+Repo X-Ray: On-Disk AST Cache
+
+Opt-in persistent cache of parsed ASTs, so repeat runs over an unchanged
+codebase unpickle trees instead of re-parsing them. Entries are keyed by
+SHA-256 of the source text plus the Python version (AST node classes and
+pickles are version specific), so edits invalidate naturally and there
+is no mtime race.
+
+Disabled unless XRAY_AST_CACHE=1. The cache directory defaults to
+.xray_cache/ast under the working directory and can be moved with
+XRAY_AST_CACHE_DIR. Any cache read/write failure falls back to a plain
+ast.parse; syntax errors propagate exactly as they would from ast.parse.
+
+Usage:
+    from ast_cache import parse_source
+
+    tree = parse_source(source)
+"""
+
+import ast
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+DEFAULT_CACHE_DIR = Path(".xray_cache") / "ast"
+
+_VERSION_TAG = "py{}.{}".format(*sys.version_info[:2]).encode()
+
+
+def _cache_dir() -> Optional[Path]:
+    """Cache directory if the cache is enabled, else None."""
+    if os.environ.get("XRAY_AST_CACHE") != "1":
+        return None
+    return Path(os.environ.get("XRAY_AST_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+
+def _cache_key(source: str) -> str:
+    """SHA-256 of the Python version tag and UTF-8 source text."""
+    digest = hashlib.sha256(_VERSION_TAG)
+    digest.update(b"\0")
+    digest.update(source.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def parse_source(source: str) -> ast.Module:
+    """
+    Parse source text, going through the on-disk cache when enabled.
+
+    Raises SyntaxError (or ValueError) for unparseable source, same as ast.parse.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return ast.parse(source)
+
+    entry = cache_dir / f"{_cache_key(source)}.pkl"
+    try:
+        with open(entry, "rb") as f:
+            tree = pickle.load(f)
+        if isinstance(tree, ast.Module):
+            return tree
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+
+    tree = ast.parse(source)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+    except (OSError, pickle.PicklingError, RecursionError):
+        pass
+    return tree
@@ -18,16 +18,126 @@ Features:
 """
 
 import ast
+import fnmatch
+import functools
+import heapq
 import json
 import os
 import re
 import subprocess
+import sys
 import urllib.request
 import urllib.error
-from collections import defaultdict
+from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Set, Tuple
 
+from ast_cache import parse_source
+
+
+# =============================================================================
+# Path Helpers
+# =============================================================================
+
+def _basename(filepath: str) -> str:
+    """Final path component, without constructing a Path object."""
+    return filepath.replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _stem(filepath: str) -> str:
+    """Final path component minus its last suffix (same rules as Path.stem)."""
+    name = _basename(filepath)
+    i = name.rfind(".")
+    return name[:i] if i > 0 else name
+
+
+# =============================================================================
+# Parse Cache
+# =============================================================================
+
+_FUNC_DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _build_function_index(tree: ast.AST) -> Dict[str, ast.AST]:
+    """
+    Map function/method names to their definition node in one walk.
+
+    Keeps the first node per name in ast.walk order, i.e. the same node a
+    ``for node in ast.walk(tree): if node.name == name: break`` scan finds.
+    """
+    index: Dict[str, ast.AST] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, _FUNC_DEF_TYPES):
+            index.setdefault(node.name, node)
+    return index
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_file_cached(filepath: str, mtime_ns: int,
+                       size: int) -> Optional[Tuple[str, ast.Module, Dict[str, ast.AST]]]:
+    """Read and parse a file; keyed on stat info so edits invalidate the entry."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            source = f.read()
+        tree = parse_source(source)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    return source, tree, _build_function_index(tree)
+
+
+def _parse_cached(filepath: str) -> Optional[Tuple[str, ast.Module, Dict[str, ast.AST]]]:
+    """
+    Return (source, tree, function index) for a Python file, or None if it
+    can't be read/parsed.
+
+    Several gap features inspect the same hotspot files; sharing one parse
+    per file avoids re-reading and re-parsing it for every helper, and the
+    function index replaces a full-tree walk per function lookup.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return _parse_file_cached(filepath, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _class_index_cached(filepath: str, mtime_ns: int,
+                        size: int) -> Optional[Dict[str, ast.ClassDef]]:
+    """Class name -> first ClassDef in ast.walk order, built on the shared parse."""
+    parsed = _parse_file_cached(filepath, mtime_ns, size)
+    if parsed is None:
+        return None
+    index: Dict[str, ast.ClassDef] = {}
+    for node in ast.walk(parsed[1]):
+        if isinstance(node, ast.ClassDef):
+            index.setdefault(node.name, node)
+    return index
+
+
+def _find_class(filepath: str, class_name: str) -> Optional[ast.ClassDef]:
+    """
+    Look up a class definition by name, or None if missing or unparseable.
+
+    The skeleton pass asks for a docstring and an __init__ signature per
+    class; both share one parse per file. Module-level classes (nearly
+    all of them) are found by scanning the top-level statements, which is
+    also where ast.walk would find them first; the full-tree class index
+    is only built for nested classes.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    parsed = _parse_file_cached(filepath, st.st_mtime_ns, st.st_size)
+    if parsed is None:
+        return None
+    for node in parsed[1].body:
+        if type(node) is ast.ClassDef and node.name == class_name:
+            return node
+    index = _class_index_cached(filepath, st.st_mtime_ns, st.st_size)
+    return index.get(class_name) if index else None
+
 
 # =============================================================================
 # GitHub About Section
@@ -158,11 +268,18 @@ def get_github_about(target_dir: str) -> Dict[str, Any]:
 
 def normalize_values(values: Dict[str, float]) -> Dict[str, float]:
     """Min-max normalize values to 0-1 range."""
-    if not values:
+    it = iter(values.values())
+    try:
+        min_val = max_val = next(it)
+    except StopIteration:
         return {}
 
-    min_val = min(values.values())
-    max_val = max(values.values())
+    # One pass for both bounds
+    for v in it:
+        if v < min_val:
+            min_val = v
+        elif v > max_val:
+            max_val = v
 
     if max_val == min_val:
         return {k: 0.5 for k in values}
@@ -178,9 +295,12 @@ def _short_name(mod_name: str) -> str:
     return mod_name.split(".")[-1] if "." in mod_name else mod_name
 
 
+_MERMAID_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+
 def _safe_mermaid_id(name: str) -> str:
     """Create a mermaid-safe node ID from a module name."""
-    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+    return _MERMAID_UNSAFE_RE.sub('_', name)
 
 
 _TS_LAYER_MAP = {
@@ -203,6 +323,40 @@ def _normalize_layers(layers):
     return dict(normalized)
 
 
+def _normalize_graph(graph) -> Dict[str, Dict[str, Any]]:
+    """Coerce list-format graph entries ``[...]`` to dict format ``{'imports': [...]}``."""
+    return {
+        mod: (data if isinstance(data, dict)
+              else {"imports": data if isinstance(data, list) else []})
+        for mod, data in graph.items()
+    }
+
+
+def _build_path_suffix_index(filepaths) -> Dict[str, str]:
+    """
+    Map every trailing path suffix to the first filepath that ends with it.
+
+    "/repo/pkg/mod.py" is indexed as "repo/pkg/mod.py", "pkg/mod.py",
+    "mod.py" and the same suffixes without the extension, so both TS-style
+    file ids and slash-converted Python module names resolve in O(1).
+    Package ``__init__`` files are also indexed under their directory.
+    """
+    index: Dict[str, str] = {}
+    for filepath in filepaths:
+        parts = filepath.replace("\\", "/").split("/")
+        stem, dot, _ = parts[-1].rpartition(".")
+        if dot and stem:
+            bare = parts[:-1] if stem == "__init__" else parts[:-1] + [stem]
+        else:
+            bare = None
+        for i in range(len(parts)):
+            index.setdefault("/".join(parts[i:]), filepath)
+            if bare and i < len(bare):
+                index.setdefault("/".join(bare[i:]), filepath)
+    index.pop("", None)
+    return index
+
+
 def get_architectural_pillars(results: Dict[str, Any], n: int = 10) -> List[Dict[str, Any]]:
     """
     Get top N files ranked by architectural importance (import weight).
@@ -217,6 +371,9 @@ def get_architectural_pillars(results: Dict[str, Any], n: int = 10) -> List[Dict
     structure = results.get("structure", {})
     files = structure.get("files", {})
 
+    # Module name -> filepath lookup, built once
+    path_index = _build_path_suffix_index(files)
+
     # Build file import weight map
     file_weights = []
     seen_names = set()
@@ -239,11 +396,7 @@ def get_architectural_pillars(results: Dict[str, Any], n: int = 10) -> List[Dict
         seen_names.add(short_name)
 
         # Find the full filepath for this module
-        filepath = None
-        for fp in files.keys():
-            if mod_name in fp or mod_name.replace(".", "/") in fp:
-                filepath = fp
-                break
+        filepath = path_index.get(mod_name) or path_index.get(mod_name.replace(".", "/"))
 
         file_weights.append({
             "file": filepath or mod_name,
@@ -253,10 +406,8 @@ def get_architectural_pillars(results: Dict[str, Any], n: int = 10) -> List[Dict
             "reason": f"imported by {imported_by_count} modules"
         })
 
-    # Sort by import count descending
-    file_weights.sort(key=lambda x: x["imported_by_count"], reverse=True)
-
-    return file_weights[:n]
+    # Top N by import count descending
+    return heapq.nlargest(n, file_weights, key=lambda x: x["imported_by_count"])
 
 
 def get_maintenance_hotspots(results: Dict[str, Any], n: int = 10) -> List[Dict[str, Any]]:
@@ -284,7 +435,7 @@ def get_maintenance_hotspots(results: Dict[str, Any], n: int = 10) -> List[Dict[
             continue
 
         # Get short name for deduplication
-        short_name = Path(filepath).name
+        short_name = _basename(filepath)
         if short_name in seen_names:
             continue
         seen_names.add(short_name)
@@ -312,10 +463,15 @@ def get_maintenance_hotspots(results: Dict[str, Any], n: int = 10) -> List[Dict[
             "reason": ", ".join(factors) if factors else "moderate risk"
         })
 
-    # Sort by risk score descending
-    hotspots.sort(key=lambda x: x["risk_score"], reverse=True)
+    # Top N by risk score descending
+    return heapq.nlargest(n, hotspots, key=lambda x: x["risk_score"])
+
 
-    return hotspots[:n]
+# Freshness penalty per git freshness category (dormant files score highest)
+_FRESHNESS_WEIGHTS = {"active": 0.0, "aging": 0.3, "stale": 0.6, "dormant": 1.0}
+
+# Directory names treated as a project root when normalizing paths for matching
+_PRIORITY_PATH_ROOTS = frozenset({"kosmos", "src", "lib", "tests"})
 
 
 def calculate_priority_scores(results: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -336,16 +492,26 @@ def calculate_priority_scores(results: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     files_data = {}
 
-    # Helper to normalize paths for matching
+    # Helper to normalize paths for matching. The same paths recur across
+    # hotspots, risk, freshness and dedup, so results are memoized per call.
+    _norm_memo: Dict[str, str] = {}
+
     def normalize_path(p: str) -> str:
         """Get the last meaningful portion of a path for matching."""
+        norm = _norm_memo.get(p)
+        if norm is not None:
+            return norm
         parts = p.replace("\\", "/").split("/")
         # Try to find the project root (e.g., kosmos/agents/...)
         for i, part in enumerate(parts):
-            if part in ("kosmos", "src", "lib", "tests"):
-                return "/".join(parts[i:])
-        # Fallback to filename
-        return parts[-1] if parts else p
+            if part in _PRIORITY_PATH_ROOTS:
+                norm = "/".join(parts[i:])
+                break
+        else:
+            # Fallback to filename
+            norm = parts[-1] if parts else p
+        _norm_memo[p] = norm
+        return norm
 
     # Build a mapping of normalized paths to full paths
     path_map = {}
@@ -357,9 +523,10 @@ def calculate_priority_scores(results: Dict[str, Any]) -> List[Dict[str, Any]]:
         if filepath:
             norm_path = normalize_path(filepath)
             path_map[norm_path] = filepath
-            if filepath not in files_data:
-                files_data[filepath] = {"cc": 0, "reasons": [], "norm_path": norm_path}
-            files_data[filepath]["cc"] = max(files_data[filepath]["cc"], hs.get("complexity", 0))
+            data = files_data.get(filepath)
+            if data is None:
+                data = files_data[filepath] = {"cc": 0, "reasons": [], "norm_path": norm_path}
+            data["cc"] = max(data["cc"], hs.get("complexity", 0))
 
     # Collect git risk scores (may use different path format)
     git = results.get("git", {})
@@ -373,13 +540,17 @@ def calculate_priority_scores(results: Dict[str, Any]) -> List[Dict[str, Any]]:
         # Try to match to existing full path
         matched_path = path_map.get(norm_path, filepath)
 
-        if matched_path not in files_data:
-            files_data[matched_path] = {"cc": 0, "reasons": [], "norm_path": norm_path}
+        data = files_data.get(matched_path)
+        if data is None:
+            data = files_data[matched_path] = {"cc": 0, "reasons": [], "norm_path": norm_path}
             path_map[norm_path] = matched_path
 
-        files_data[matched_path]["git_risk"] = r.get("risk_score", 0)
-        files_data[matched_path]["churn"] = r.get("churn", 0)
-        files_data[matched_path]["hotfixes"] = r.get("hotfixes", 0)
+        data["git_risk"] = r.get("risk_score", 0)
+        data["churn"] = r.get("churn", 0)
+        data["hotfixes"] = r.get("hotfixes", 0)
+
+    # Resolve module names with a dict hit instead of a substring scan
+    path_index = _build_path_suffix_index(files_data)
 
     # Collect import weights (from calls data)
     calls = results.get("calls", {})
@@ -391,102 +562,112 @@ def calculate_priority_scores(results: Dict[str, Any]) -> List[Dict[str, Any]]:
         if "." in func:
             module_part = func.rsplit(".", 1)[0]
             # Match against known files
-            for filepath, data in files_data.items():
-                if module_part in filepath or module_part in data.get("norm_path", ""):
-                    data["import_weight"] = max(data.get("import_weight", 0), call_sites)
-                    break
+            hit = path_index.get(module_part) or path_index.get(module_part.replace(".", "/"))
+            if hit is not None:
+                data = files_data[hit]
+                data["import_weight"] = max(data.get("import_weight", 0), call_sites)
 
     # Collect freshness (inverse - active files get lower freshness penalty)
     freshness = git.get("freshness", {})
     for category, category_files in freshness.items():
-        weight = {"active": 0.0, "aging": 0.3, "stale": 0.6, "dormant": 1.0}.get(category, 0)
+        weight = _FRESHNESS_WEIGHTS.get(category, 0)
         for f in category_files:
             fp = f.get("file", f) if isinstance(f, dict) else f
-            norm_fp = normalize_path(fp)
-            matched_path = path_map.get(norm_fp, fp)
-            if matched_path in files_data:
-                files_data[matched_path]["freshness"] = weight
+            data = files_data.get(path_map.get(normalize_path(fp), fp))
+            if data is not None:
+                data["freshness"] = weight
 
     # Check which files have tests (untested files get penalty)
     tests = results.get("tests", {})
     tested_modules = set(tests.get("tested_modules", []))
 
-    # Normalize each signal
-    cc_scores = {f: d.get("cc", 0) for f, d in files_data.items()}
-    import_scores = {f: d.get("import_weight", 0) for f, d in files_data.items()}
-    risk_scores = {f: d.get("git_risk", 0) for f, d in files_data.items()}
-    freshness_scores = {f: d.get("freshness", 0.5) for f, d in files_data.items()}
-
-    n_cc = normalize_values(cc_scores)
-    n_imp = normalize_values(import_scores)
-    n_risk = normalize_values(risk_scores)
-    n_fresh = normalize_values(freshness_scores)
+    # Lay the four raw signals (cc, import weight, git risk, freshness) out
+    # as columns so min/max and min-max normalization run as builtin /
+    # comprehension passes per signal rather than per-file dict work.
+    # Normalization matches normalize_values(): flat signals become 0.5.
+    entries = list(files_data.items())
+    columns = (
+        [d.get("cc", 0) for _, d in entries],
+        [d.get("import_weight", 0) for _, d in entries],
+        [d.get("git_risk", 0) for _, d in entries],
+        [d.get("freshness", 0.5) for _, d in entries],
+    )
+    normalized = []
+    for col in columns:
+        lo = min(col, default=0)
+        span = max(col, default=0) - lo
+        normalized.append([(v - lo) / span for v in col] if span else [0.5] * len(col))
+
+    # Weighted score (total = 1.0, Untested added per file below)
+    # CC: 0.25, Import: 0.20, GitRisk: 0.30, Freshness: 0.15, Untested: 0.10
+    partial_scores = [
+        (s_cc * 0.25) + (s_imp * 0.20) + (s_risk * 0.30) + (s_fresh * 0.15)
+        for s_cc, s_imp, s_risk, s_fresh in zip(*normalized)
+    ]
 
     # Calculate composite scores
     priority_files = []
+    high_risk_files = []  # Candidates for the git-risk fallback below
     seen_basenames = set()  # Track to avoid duplicates
 
-    for filepath, data in files_data.items():
+    for (filepath, data), partial in zip(entries, partial_scores):
         # Skip duplicates based on normalized path
         norm = data.get("norm_path", normalize_path(filepath))
         if norm in seen_basenames:
             continue
         seen_basenames.add(norm)
 
-        s_cc = n_cc.get(filepath, 0)
-        s_imp = n_imp.get(filepath, 0)
-        s_risk = n_risk.get(filepath, 0)
-        s_fresh = n_fresh.get(filepath, 0)
-
         # Check if file has tests
-        filename_stem = Path(filepath).stem
+        filename_stem = _stem(filepath)
         s_untested = 0.0 if filename_stem in tested_modules else 1.0
 
-        # Weighted score (total = 1.0)
-        # CC: 0.25, Import: 0.20, GitRisk: 0.30, Freshness: 0.15, Untested: 0.10
-        score = (s_cc * 0.25) + (s_imp * 0.20) + (s_risk * 0.30) + (s_fresh * 0.15) + (s_untested * 0.10)
+        score = partial + (s_untested * 0.10)
 
         # Build reasons list
+        cc = data.get("cc", 0)
+        git_risk = data.get("git_risk", 0)
+        churn = data.get("churn", 0)
+        hotfixes = data.get("hotfixes", 0)
         reasons = []
-        if data.get("cc", 0) > 10:
-            reasons.append(f"CC:{data.get('cc', 0)}")
-        if data.get("git_risk", 0) > 0.5:
-            reasons.append(f"risk:{data.get('git_risk', 0):.2f}")
-        if data.get("churn", 0) > 5:
-            reasons.append(f"churn:{data.get('churn', 0)}")
-        if data.get("hotfixes", 0) > 3:
-            reasons.append(f"hotfix:{data.get('hotfixes', 0)}")
+        if cc > 10:
+            reasons.append(f"CC:{cc}")
+        if git_risk > 0.5:
+            reasons.append(f"risk:{git_risk:.2f}")
+        if churn > 5:
+            reasons.append(f"churn:{churn}")
+        if hotfixes > 3:
+            reasons.append(f"hotfix:{hotfixes}")
         if data.get("import_weight", 0) > 10:
             reasons.append("many callers")
         if s_untested > 0:
             reasons.append("untested")
 
-        priority_files.append({
+        entry = {
             "file": filepath,
             "score": round(score, 3),
             "reasons": reasons if reasons else ["active"],
-            "raw_risk": data.get("git_risk", 0)  # Keep raw risk for fallback
-        })
+        }
+        priority_files.append(entry)
+        if git_risk > 0.7:
+            high_risk_files.append(entry)
 
-    # Sort by score descending
-    priority_files.sort(key=lambda x: x["score"], reverse=True)
+    # Top 20 by score descending (heap selection, no full sort needed)
+    top_20 = heapq.nlargest(20, priority_files, key=lambda x: x["score"])
 
     # Fallback: ensure top git risk files appear even if they didn't score high
     # This handles cases where high-risk files have low CC
-    top_risk_files = [pf for pf in priority_files if pf.get("raw_risk", 0) > 0.7]
-    top_20 = priority_files[:20]
+    top_risk_files = heapq.nlargest(3, high_risk_files, key=lambda x: x["score"])
 
-    # Add any high-risk files not in top 20
+    # Add any high-risk files not in top 20, then re-rank the survivors
     top_20_paths = {pf["file"] for pf in top_20}
-    for risk_file in top_risk_files[:3]:  # At most 3 high-risk additions
+    added = False
+    for risk_file in top_risk_files:  # At most 3 high-risk additions
         if risk_file["file"] not in top_20_paths:
             top_20.append(risk_file)
+            added = True
 
-    # Remove raw_risk from output and re-sort
-    for pf in top_20:
-        pf.pop("raw_risk", None)
-
-    top_20.sort(key=lambda x: x["score"], reverse=True)
+    if added:
+        top_20.sort(key=lambda x: x["score"], reverse=True)
 
     return top_20[:20]
 
@@ -592,6 +773,15 @@ def generate_mermaid_diagram(
 
     lines = ["```mermaid", "graph TD"]
 
+    # The same module recurs across nodes, edges and circular pairs
+    id_cache: Dict[str, str] = {}
+
+    def mermaid_id(mod: str) -> str:
+        node_id = id_cache.get(mod)
+        if node_id is None:
+            node_id = id_cache[mod] = _safe_mermaid_id(mod)
+        return node_id
+
     # Track nodes we've added
     added_nodes = set()
 
@@ -602,27 +792,29 @@ def generate_mermaid_diagram(
             continue
 
         # Limit modules per layer
-        display_modules = layer_modules[:10]
+        display_modules = [
+            mod.get("module", mod.get("name", str(mod))) if isinstance(mod, dict) else mod
+            for mod in layer_modules[:10]
+        ]
 
+        # Emit the subgraph as one batch (node label is the short display name)
         lines.append(f"    subgraph {layer_name.upper()}")
-        for mod in display_modules:
-            # Shorten module name for display
-            if isinstance(mod, dict):
-                mod = mod.get("module", mod.get("name", str(mod)))
-            short_name = _short_name(mod)
-            safe_id = _safe_mermaid_id(mod)
-            lines.append(f"        {safe_id}[{short_name}]")
-            added_nodes.add(mod)
+        lines.extend(f"        {mermaid_id(mod)}[{_short_name(mod)}]" for mod in display_modules)
         lines.append("    end")
+        added_nodes.update(display_modules)
 
-    # Add edges from orchestration to other layers
+    # Node set is read-only from here on
+    added_nodes = frozenset(added_nodes)
+
+    # Add edges from orchestration to other layers (edges need both
+    # endpoints on the diagram, so there is nothing to do without nodes)
     edges_added = set()
-    orch_modules = layers.get("orchestration", [])[:5]
+    orch_modules = layers.get("orchestration", [])[:5] if added_nodes else []
 
     for mod in orch_modules:
         if isinstance(mod, dict):
             mod = mod.get("module", mod.get("name", str(mod)))
-        mod_id = _safe_mermaid_id(mod)
+        mod_id = mermaid_id(mod)
 
         # Get imports for this module from graph
         # Handle both formats: list of imports or dict with 'imports' key
@@ -632,21 +824,21 @@ def generate_mermaid_diagram(
         else:
             imports = mod_data
 
-        for imp in imports[:3]:  # Limit edges per module
-            if imp in added_nodes:
-                imp_id = _safe_mermaid_id(imp)
-                edge = (mod_id, imp_id)
-                if edge not in edges_added:
-                    lines.append(f"    {mod_id} --> {imp_id}")
-                    edges_added.add(edge)
+        # Limit edges per module; only link to nodes on the diagram
+        for imp in [i for i in imports[:3] if i in added_nodes]:
+            imp_id = mermaid_id(imp)
+            edge = (mod_id, imp_id)
+            if edge not in edges_added:
+                lines.append(f"    {mod_id} --> {imp_id}")
+                edges_added.add(edge)
 
     # Add circular dependency warnings
     circular = import_data.get("circular", [])
     for pair in circular[:5]:
         if len(pair) >= 2:
             a, b = pair[0], pair[1]
-            a_id = _safe_mermaid_id(a)
-            b_id = _safe_mermaid_id(b)
+            a_id = mermaid_id(a)
+            b_id = mermaid_id(b)
             lines.append(f"    {a_id} <-.-> {b_id}")
 
     lines.append("```")
@@ -686,7 +878,7 @@ def detect_hazards(results: Dict[str, Any], threshold_tokens: int = 10000) -> Li
             tokens = tokens_data
 
         if tokens >= threshold_tokens:
-            filename = Path(filepath).name
+            filename = _basename(filepath)
 
             # Skip duplicates (same filename in different paths)
             if filename in seen_basenames:
@@ -694,10 +886,11 @@ def detect_hazards(results: Dict[str, Any], threshold_tokens: int = 10000) -> Li
             seen_basenames.add(filename)
 
             # Determine recommendation
+            filename_lower = filename.lower()
             recommendation = "Use skeleton view"
-            if "generated" in filename.lower() or "auto" in filename.lower():
+            if "generated" in filename_lower or "auto" in filename_lower:
                 recommendation = "Skip - auto-generated"
-            elif "test" in filename.lower():
+            elif "test" in filename_lower:
                 recommendation = "Skip unless debugging tests"
             elif tokens > 50000:
                 recommendation = "Never read directly"
@@ -708,10 +901,8 @@ def detect_hazards(results: Dict[str, Any], threshold_tokens: int = 10000) -> Li
                 "recommendation": recommendation
             })
 
-    # Sort by tokens descending
-    hazards.sort(key=lambda x: x["tokens"], reverse=True)
-
-    return hazards[:20]  # Top 20
+    # Top 20 by tokens descending
+    return heapq.nlargest(20, hazards, key=lambda x: x["tokens"])
 
 
 # =============================================================================
@@ -727,6 +918,20 @@ DATA_MODEL_BASES = {
 
 DATA_MODEL_DECORATORS = {"dataclass", "dataclasses.dataclass", "attrs.define", "attr.s"}
 
+
+def _substring_matcher(patterns: Set[str]):
+    """
+    Compile a pattern set into one regex search equivalent to
+    ``any(p in text for p in patterns)``. Patterns that contain another
+    pattern are redundant for substring matching and are dropped.
+    """
+    minimal = sorted(p for p in patterns if not any(q != p and q in p for q in patterns))
+    return re.compile("|".join(re.escape(p) for p in minimal)).search
+
+
+_match_model_base = _substring_matcher(DATA_MODEL_BASES)
+_match_model_decorator = _substring_matcher(DATA_MODEL_DECORATORS)
+
 # Pydantic Field constraint keywords
 FIELD_CONSTRAINTS = {
     "gt", "ge", "lt", "le",  # Numeric constraints
@@ -740,6 +945,39 @@ FIELD_CONSTRAINTS = {
 }
 
 
+# Ordered domain rules: (path pattern, name pattern, domain). A rule matches
+# when either pattern is found in the lowercased path / name; first match wins.
+_PY_MODEL_DOMAIN_RULES = (
+    (re.compile(r"agent"), re.compile(r"agent$"), "Agents"),
+    (re.compile(r"api|handler|endpoint"), None, "API"),
+    (None, re.compile(r"config|settings"), "Config"),
+    (None, re.compile(r"request|response"), "API"),
+    (re.compile(r"model|schema"), None, "Models"),
+    (re.compile(r"workflow|task"), None, "Workflows"),
+)
+
+_TS_MODEL_DOMAIN_RULES = (
+    (re.compile(r"api|handler|controller"), None, "API"),
+    (re.compile(r"model|schema|entity"), None, "Models"),
+    (None, re.compile(r"config|settings|options"), "Config"),
+    (None, re.compile(r"request|response"), "API"),
+)
+
+
+def _classify_model_domain(filepath: str, name: str, rules: Tuple) -> str:
+    """Bucket a data model by path/name keywords, else by parent directory."""
+    path_lower = filepath.lower()
+    name_lower = name.lower()
+    for path_re, name_re, domain in rules:
+        if (path_re is not None and path_re.search(path_lower)) or \
+                (name_re is not None and name_re.search(name_lower)):
+            return domain
+
+    # Use parent directory as domain
+    parts = filepath.replace("\\", "/").split("/")
+    return parts[-2].title() if len(parts) >= 2 else "Other"
+
+
 def _extract_field_constraints(filepath: str, class_name: str) -> Dict[str, Dict[str, Any]]:
     """
     Extract Pydantic Field() constraints for a class.
@@ -885,6 +1123,7 @@ def extract_data_models(results: Dict[str, Any]) -> List[Dict[str, Any]]:
 
     for filepath, data in files.items():
         classes = data.get("classes", [])
+        filename = _basename(filepath)
 
         for cls in classes:
             is_data_model = False
@@ -892,53 +1131,36 @@ def extract_data_models(results: Dict[str, Any]) -> List[Dict[str, Any]]:
             cls_name = cls.get("name", "Unknown")
 
             # Skip duplicates (same class name in different paths)
-            filename = Path(filepath).name
-            key = f"{filename}:{cls_name}"
+            key = (filename, cls_name)
             if key in seen_models:
                 continue
 
-            # Check base classes
             bases = cls.get("bases", [])
-            for base in bases:
-                if base in DATA_MODEL_BASES or any(b in base for b in DATA_MODEL_BASES):
-                    is_data_model = True
-                    model_type = "Pydantic" if "BaseModel" in base else "TypedDict"
-                    break
-
-            # Check decorators
             decorators = cls.get("decorators", [])
+            if not bases and not decorators:
+                continue
+
+            # Check decorators first: most models are dataclasses, and a
+            # matching decorator takes precedence over any matching base
             for dec in decorators:
-                if any(d in dec for d in DATA_MODEL_DECORATORS):
+                if dec in DATA_MODEL_DECORATORS or _match_model_decorator(dec):
                     is_data_model = True
                     model_type = "dataclass"
                     break
 
+            # Check base classes
+            if not is_data_model:
+                for base in bases:
+                    if base in DATA_MODEL_BASES or _match_model_base(base):
+                        is_data_model = True
+                        model_type = "Pydantic" if "BaseModel" in base else "TypedDict"
+                        break
+
             if is_data_model:
                 seen_models.add(key)
 
                 # Determine domain category from filepath and class name
-                path_lower = filepath.lower()
-                name_lower = cls_name.lower()
-
-                if "agent" in path_lower or name_lower.endswith("agent"):
-                    domain = "Agents"
-                elif "api" in path_lower or "handler" in path_lower or "endpoint" in path_lower:
-                    domain = "API"
-                elif "config" in name_lower or "settings" in name_lower:
-                    domain = "Config"
-                elif "request" in name_lower or "response" in name_lower:
-                    domain = "API"
-                elif "model" in path_lower or "schema" in path_lower:
-                    domain = "Models"
-                elif "workflow" in path_lower or "task" in path_lower:
-                    domain = "Workflows"
-                else:
-                    # Use parent directory as domain
-                    parts = filepath.replace("\\", "/").split("/")
-                    if len(parts) >= 2:
-                        domain = parts[-2].title()
-                    else:
-                        domain = "Other"
+                domain = _classify_model_domain(filepath, cls_name, _PY_MODEL_DOMAIN_RULES)
 
                 # Extract Pydantic-specific features if applicable
                 field_constraints = {}
@@ -966,26 +1188,14 @@ def extract_data_models(results: Dict[str, Any]) -> List[Dict[str, Any]]:
         for filepath, fdata in files.items():
             for iface in fdata.get("ts_interfaces", []):
                 name = iface.get("name", "")
-                key = f"{filepath}:{name}"
+                key = (filepath, name)
                 if key in seen_models:
                     continue
                 seen_models.add(key)
                 fields = [{"name": m["name"], "type": m.get("type", ""), "required": not m.get("optional", False)}
                           for m in iface.get("members", [])]
                 # Determine domain from filepath
-                path_lower = filepath.lower()
-                name_lower = name.lower()
-                if "api" in path_lower or "handler" in path_lower or "controller" in path_lower:
-                    domain = "API"
-                elif "model" in path_lower or "schema" in path_lower or "entity" in path_lower:
-                    domain = "Models"
-                elif "config" in name_lower or "settings" in name_lower or "options" in name_lower:
-                    domain = "Config"
-                elif "request" in name_lower or "response" in name_lower:
-                    domain = "API"
-                else:
-                    parts = filepath.replace("\\", "/").split("/")
-                    domain = parts[-2].title() if len(parts) >= 2 else "Other"
+                domain = _classify_model_domain(filepath, name, _TS_MODEL_DOMAIN_RULES)
                 models.append({
                     "name": name,
                     "type": "interface",
@@ -998,7 +1208,7 @@ def extract_data_models(results: Dict[str, Any]) -> List[Dict[str, Any]]:
             for ta in fdata.get("ts_type_aliases", []):
                 if ta.get("type_kind") == "object":
                     name = ta.get("name", "")
-                    key = f"{filepath}:{name}"
+                    key = (filepath, name)
                     if key in seen_models:
                         continue
                     seen_models.add(key)
@@ -1050,17 +1260,20 @@ def detect_entry_points(results: Dict[str, Any], target_dir: str = ".") -> List[
     # Get project name from target directory
     project_name = Path(target_dir).name
 
+    # Loop-invariant: whether the package is runnable with `python -m`
+    has_dunder_main = any(_basename(f) == "__main__.py" for f in files)
+
     def make_usage(filepath, filename):
         if is_ts:
             return f"npx tsx {filepath}"
         if filename == "__main__.py":
             return f"python -m {project_name}"
         if filename == "cli.py":
-            return f"python -m {project_name}" if "__main__.py" in [Path(f).name for f in files] else f"python {filepath}"
+            return f"python -m {project_name}" if has_dunder_main else f"python {filepath}"
         return f"python {filepath}"
 
     for filepath, data in files.items():
-        filename = Path(filepath).name
+        filename = _basename(filepath)
 
         # Check if file is an entry point by name
         if filename in entry_point_files:
@@ -1072,11 +1285,14 @@ def detect_entry_points(results: Dict[str, Any], target_dir: str = ".") -> List[
             })
             seen_files.add(filepath)
 
-        # Check for entry point functions
-        functions = data.get("functions", [])
-        for func in functions:
-            func_name = func.get("name", "")
-            if func_name in ENTRY_POINT_FUNCTIONS and filepath not in seen_files:
+        # Check for entry point functions (files already listed are skipped)
+        if filepath in seen_files:
+            continue
+        func_names = [func.get("name", "") for func in data.get("functions", [])]
+        if ENTRY_POINT_FUNCTIONS.isdisjoint(func_names):
+            continue
+        for func_name in func_names:
+            if func_name in ENTRY_POINT_FUNCTIONS:
                 entry_points.append({
                     "entry_point": f"{func_name}()",
                     "file": filepath,
@@ -1397,6 +1613,69 @@ def extract_cli_arguments(entry_points: List[Dict[str, Any]], structure: Dict[st
 # Logic Map Generation
 # =============================================================================
 
+# Call-text patterns for logic maps (lowercase substrings)
+_LOGIC_SIDE_EFFECT_PATTERNS = {
+    'db': ('db.save', 'db.commit', 'session.commit', 'cursor.execute',
+           '.insert(', '.update(', '.delete('),
+    'api': ('requests.', 'httpx.', '.post(', '.put(', '.patch(', 'fetch('),
+    'file': ('file.write', '.write(', 'json.dump', 'pickle.dump'),
+    'email': ('send_email', 'send_mail', 'notify('),
+    'cache': ('cache.set', 'redis.set', 'cache.invalidate'),
+}
+
+_LOGIC_SAFE_PATTERNS = ('.get(', 'isinstance', 'hasattr', 'getattr', 'len(', 'str(', 'int(')
+
+_LOGIC_INPUT_PATTERNS = ('request.', 'input(', 'args.', 'params.', 'payload.')
+
+# One compiled multi-pattern scan per table; categories keep dict order so
+# the first matching category still wins
+_match_logic_safe = _substring_matcher(set(_LOGIC_SAFE_PATTERNS))
+_match_logic_input = _substring_matcher(set(_LOGIC_INPUT_PATTERNS))
+_LOGIC_SIDE_EFFECT_MATCHERS = tuple(
+    (category, _substring_matcher(set(patterns)))
+    for category, patterns in _LOGIC_SIDE_EFFECT_PATTERNS.items()
+)
+
+
+# Shared logic-map indent strings, one object per depth, so flow lines
+# at the same nesting level reuse a single prefix instead of fresh copies
+_LOGIC_INDENTS = tuple("  " * d for d in range(64))
+_LOGIC_NEXT_INDENT = dict(zip(_LOGIC_INDENTS, _LOGIC_INDENTS[1:]))
+
+# Conditions at or above this length are rarely repeated; don't intern them
+_LOGIC_INTERN_MAX = 64
+
+
+def _indent(depth: int) -> str:
+    """Indent prefix for a logic-map nesting depth."""
+    return _LOGIC_INDENTS[depth] if depth < len(_LOGIC_INDENTS) else "  " * depth
+
+
+def _nested_indent(prefix: str) -> str:
+    """Indent prefix one level deeper than ``prefix``."""
+    return _LOGIC_NEXT_INDENT.get(prefix) or prefix + "  "
+
+
+@functools.lru_cache(maxsize=4096)
+def _classify_call_text(call_text: str) -> Tuple[Optional[str], bool]:
+    """
+    Classify a call's text as (side-effect category or None, is external input).
+
+    Call texts repeat heavily within and across files, so results are
+    memoized and the text is lowercased once per distinct call.
+    """
+    call_lower = call_text.lower()
+    is_input = _match_logic_input(call_lower) is not None
+
+    if _match_logic_safe(call_lower):
+        return None, is_input
+
+    for category, match in _LOGIC_SIDE_EFFECT_MATCHERS:
+        if match(call_lower):
+            return category, is_input
+    return None, is_input
+
+
 class LogicMapGenerator:
     """
     Generates control flow logic maps from Python AST.
@@ -1410,45 +1689,39 @@ class LogicMapGenerator:
     - <X> : External input
     """
 
-    SIDE_EFFECT_PATTERNS = {
-        'db': ['db.save', 'db.commit', 'session.commit', 'cursor.execute',
-               '.insert(', '.update(', '.delete('],
-        'api': ['requests.', 'httpx.', '.post(', '.put(', '.patch(', 'fetch('],
-        'file': ['file.write', '.write(', 'json.dump', 'pickle.dump'],
-        'email': ['send_email', 'send_mail', 'notify('],
-        'cache': ['cache.set', 'redis.set', 'cache.invalidate'],
-    }
+    SIDE_EFFECT_PATTERNS = _LOGIC_SIDE_EFFECT_PATTERNS
 
-    SAFE_PATTERNS = ['.get(', 'isinstance', 'hasattr', 'getattr', 'len(', 'str(', 'int(']
+    SAFE_PATTERNS = _LOGIC_SAFE_PATTERNS
 
-    INPUT_PATTERNS = ['request.', 'input(', 'args.', 'params.', 'payload.']
+    INPUT_PATTERNS = _LOGIC_INPUT_PATTERNS
 
-    def __init__(self, source: str, detail_level: int = 2):
+    def __init__(self, source: str, detail_level: int = 2, tree: Optional[ast.AST] = None,
+                 func_index: Optional[Dict[str, ast.AST]] = None):
         self.source = source
         self.detail_level = detail_level
-        self.tree = None
+        self.tree = tree
+        self.func_index = func_index
 
     def parse(self) -> bool:
-        """Parse the source code."""
-        try:
-            self.tree = ast.parse(self.source)
-            return True
-        except SyntaxError:
-            return False
+        """Parse the source code (no-op if a pre-parsed tree was supplied)."""
+        if self.tree is None:
+            try:
+                self.tree = ast.parse(self.source)
+            except SyntaxError:
+                return False
+        if self.func_index is None:
+            self.func_index = _build_function_index(self.tree)
+        return True
 
     def generate_logic_map(self, method_name: str) -> Optional[Dict[str, Any]]:
         """Generate a logic map for a specific method."""
         if not self.tree:
             return None
+        if self.func_index is None:
+            self.func_index = _build_function_index(self.tree)
 
         # Find the method
-        method_node = None
-        for node in ast.walk(self.tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                if node.name == method_name:
-                    method_node = node
-                    break
-
+        method_node = self.func_index.get(method_name)
         if not method_node:
             return None
 
@@ -1466,68 +1739,111 @@ class LogicMapGenerator:
         return logic_map
 
     def _analyze_node(self, node: ast.AST, logic_map: Dict, depth: int = 0):
-        """Recursively analyze AST nodes to build logic map."""
-        prefix = "  " * depth
-
-        for child in ast.iter_child_nodes(node):
-            # Conditionals
-            if isinstance(child, ast.If):
-                condition = self._get_condition_text(child.test)
-                logic_map["conditions"].append(condition)
-                logic_map["flow"].append(f"{prefix}-> {condition}?")
-                self._analyze_node(child, logic_map, depth + 1)
-
-            # Loops
-            elif isinstance(child, (ast.For, ast.AsyncFor)):
-                target = self._node_to_text(child.target)
-                iter_name = self._node_to_text(child.iter)
-                logic_map["flow"].append(f"{prefix}* for {target} in {iter_name}:")
-                self._analyze_node(child, logic_map, depth + 1)
-
-            elif isinstance(child, ast.While):
-                condition = self._get_condition_text(child.test)
-                logic_map["flow"].append(f"{prefix}* while {condition}:")
-                self._analyze_node(child, logic_map, depth + 1)
-
-            # Function calls - check for side effects
-            elif isinstance(child, ast.Call):
-                call_text = self._get_call_text(child)
-                side_effect = self._detect_side_effect(call_text)
-                if side_effect:
-                    logic_map["side_effects"].append(side_effect)
-                    logic_map["flow"].append(f"{prefix}[{side_effect}]")
-                elif self._is_external_input(call_text):
-                    logic_map["flow"].append(f"{prefix}<{call_text}>")
-
-            # Assignments - check for state mutations
-            elif isinstance(child, ast.Assign):
-                for target in child.targets:
-                    if isinstance(target, ast.Attribute):
-                        if isinstance(target.value, ast.Name) and target.value.id == "self":
-                            mutation = f"self.{target.attr}"
-                            logic_map["state_mutations"].append(mutation)
-                            logic_map["flow"].append(f"{prefix}{{{mutation}}}")
-
-            # Return statements
-            elif isinstance(child, ast.Return):
-                if child.value:
-                    ret_text = self._node_to_text(child.value)
-                    logic_map["flow"].append(f"{prefix}-> Return({ret_text})")
-                else:
-                    logic_map["flow"].append(f"{prefix}-> Return")
-
-            # Exception handling
-            elif isinstance(child, ast.Try):
-                logic_map["flow"].append(f"{prefix}try:")
-                self._analyze_node(child, logic_map, depth + 1)
-                for handler in child.handlers:
-                    exc_type = "Exception"
-                    if handler.type and hasattr(handler.type, "id"):
-                        exc_type = handler.type.id
-                    logic_map["flow"].append(f"{prefix}! except {exc_type}")
+        """
+        Analyze AST nodes under ``node`` in source order to build logic map.
+
+        Uses an explicit stack of child iterators instead of recursion, so
+        deeply nested code needs no Python frames. Each stack entry is
+        (children, prefix, trailer); the indent prefix is built once per
+        nesting level rather than once per node, and trailer lines (a try
+        block's handlers) are emitted once that block's children are
+        exhausted.
+        """
+        flow = logic_map["flow"]
+        stack = [(ast.iter_child_nodes(node), _indent(depth), None)]
+        handler_for = self._NODE_HANDLERS.get
+
+        while stack:
+            children, prefix, trailer = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if trailer:
+                    flow.extend(trailer)
+                continue
 
+            handler = handler_for(type(child))
+            if handler is None:
+                stack.append((ast.iter_child_nodes(child), prefix, None))
             else:
-                self._analyze_node(child, logic_map, depth)
+                handler(self, child, prefix, logic_map, stack)
+
+    # Per-node-type handlers for _analyze_node. Each appends its flow lines
+    # and pushes the node's children onto ``stack`` only if they should be
+    # descended into (calls, assignments and returns are leaves here).
+
+    def _visit_if(self, node: ast.If, prefix: str, logic_map: Dict, stack: List):
+        """Conditionals."""
+        condition = self._get_condition_text(node.test)
+        if len(condition) < _LOGIC_INTERN_MAX:
+            # Short conditions ("x is None") repeat across functions
+            condition = sys.intern(condition)
+        logic_map["conditions"].append(condition)
+        logic_map["flow"].append(f"{prefix}-> {condition}?")
+        stack.append((ast.iter_child_nodes(node), _nested_indent(prefix), None))
+
+    def _visit_for(self, node: ast.AST, prefix: str, logic_map: Dict, stack: List):
+        """Loops (for / async for)."""
+        target = self._node_to_text(node.target)
+        iter_name = self._node_to_text(node.iter)
+        logic_map["flow"].append(f"{prefix}* for {target} in {iter_name}:")
+        stack.append((ast.iter_child_nodes(node), _nested_indent(prefix), None))
+
+    def _visit_while(self, node: ast.While, prefix: str, logic_map: Dict, stack: List):
+        """While loops."""
+        condition = self._get_condition_text(node.test)
+        logic_map["flow"].append(f"{prefix}* while {condition}:")
+        stack.append((ast.iter_child_nodes(node), _nested_indent(prefix), None))
+
+    def _visit_call(self, node: ast.Call, prefix: str, logic_map: Dict, stack: List):
+        """Function calls - check for side effects (and external input at full detail)."""
+        call_text = self._get_call_text(node)
+        side_effect = self._detect_side_effect(call_text)
+        if side_effect:
+            logic_map["side_effects"].append(side_effect)
+            logic_map["flow"].append(f"{prefix}[{side_effect}]")
+        elif self.detail_level >= 2 and self._is_external_input(call_text):
+            logic_map["flow"].append(f"{prefix}<{call_text}>")
+
+    def _visit_assign(self, node: ast.Assign, prefix: str, logic_map: Dict, stack: List):
+        """Assignments - check for state mutations."""
+        for target in node.targets:
+            if isinstance(target, ast.Attribute):
+                if isinstance(target.value, ast.Name) and target.value.id == "self":
+                    mutation = f"self.{target.attr}"
+                    logic_map["state_mutations"].append(mutation)
+                    logic_map["flow"].append(f"{prefix}{{{mutation}}}")
+
+    def _visit_return(self, node: ast.Return, prefix: str, logic_map: Dict, stack: List):
+        """Return statements."""
+        if node.value:
+            ret_text = self._node_to_text(node.value)
+            logic_map["flow"].append(f"{prefix}-> Return({ret_text})")
+        else:
+            logic_map["flow"].append(f"{prefix}-> Return")
+
+    def _visit_try(self, node: ast.Try, prefix: str, logic_map: Dict, stack: List):
+        """Exception handling; handler lines are emitted after the try body."""
+        logic_map["flow"].append(f"{prefix}try:")
+        handlers = []
+        for handler in node.handlers:
+            exc_type = "Exception"
+            if handler.type and hasattr(handler.type, "id"):
+                exc_type = handler.type.id
+            handlers.append(f"{prefix}! except {exc_type}")
+        stack.append((ast.iter_child_nodes(node), _nested_indent(prefix), handlers))
+
+    # Exact-type dispatch: one dict lookup per node instead of an isinstance chain
+    _NODE_HANDLERS = {
+        ast.If: _visit_if,
+        ast.For: _visit_for,
+        ast.AsyncFor: _visit_for,
+        ast.While: _visit_while,
+        ast.Call: _visit_call,
+        ast.Assign: _visit_assign,
+        ast.Return: _visit_return,
+        ast.Try: _visit_try,
+    }
 
     def _get_condition_text(self, node: ast.AST) -> str:
         """Extract readable text from a condition node."""
@@ -1572,91 +1888,108 @@ class LogicMapGenerator:
 
     def _detect_side_effect(self, call_text: str) -> Optional[str]:
         """Detect if a call has side effects."""
-        call_lower = call_text.lower()
-
-        for safe in self.SAFE_PATTERNS:
-            if safe in call_lower:
-                return None
-
-        for category, patterns in self.SIDE_EFFECT_PATTERNS.items():
-            for pattern in patterns:
-                if pattern in call_lower:
-                    return f"{category.upper()}: {call_text}"
+        category = _classify_call_text(call_text)[0]
+        if category:
+            return f"{category.upper()}: {call_text}"
         return None
 
     def _is_external_input(self, call_text: str) -> bool:
         """Check if a call represents external input."""
-        call_lower = call_text.lower()
-        return any(pattern in call_lower for pattern in self.INPUT_PATTERNS)
+        return _classify_call_text(call_text)[1]
 
 
 def _extract_function_docstring(source: str, func_name: str) -> Optional[str]:
     """Extract docstring for a function."""
     try:
-        tree = ast.parse(source)
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == func_name:
-                if (node.body and isinstance(node.body[0], ast.Expr) and
-                    isinstance(node.body[0].value, ast.Constant) and
-                    isinstance(node.body[0].value.value, str)):
-                    docstring = node.body[0].value.value
-                    # Return first sentence only
-                    first_line = docstring.split('\n')[0].strip()
-                    return first_line if first_line else None
-        return None
+        node = _build_function_index(ast.parse(source)).get(func_name)
     except SyntaxError:
         return None
+    return _function_docstring(node) if node else None
+
+
+def _function_docstring(node: ast.AST) -> Optional[str]:
+    """First line of a function node's docstring, or None."""
+    if (node.body and isinstance(node.body[0], ast.Expr) and
+        isinstance(node.body[0].value, ast.Constant) and
+        isinstance(node.body[0].value.value, str)):
+        docstring = node.body[0].value.value
+        # Return first sentence only
+        first_line = docstring.split('\n')[0].strip()
+        return first_line if first_line else None
+    return None
 
 
 def _generate_heuristic_summary(source: str, func_name: str) -> str:
     """Generate heuristic summary from AST patterns."""
     try:
-        tree = ast.parse(source)
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == func_name:
-                # Count patterns
-                loop_count = 0
-                try_count = 0
-                conditional_count = 0
-                return_count = 0
-                early_returns = False
-
-                for child in ast.walk(node):
-                    if isinstance(child, (ast.For, ast.AsyncFor, ast.While)):
-                        loop_count += 1
-                    elif isinstance(child, ast.Try):
-                        try_count += 1
-                    elif isinstance(child, ast.If):
-                        conditional_count += 1
-                    elif isinstance(child, ast.Return):
-                        return_count += 1
-                        # Check if return is inside an If (early return pattern)
-                        for parent in ast.walk(node):
-                            if isinstance(parent, ast.If):
-                                for if_child in ast.walk(parent):
-                                    if child == if_child:
-                                        early_returns = True
-
-                # Build summary parts
-                parts = []
-                if loop_count > 0:
-                    parts.append(f"Iterates over {loop_count} collection{'s' if loop_count > 1 else ''}")
-                if conditional_count > 0:
-                    parts.append(f"{conditional_count} decision branch{'es' if conditional_count > 1 else ''}")
-                if try_count > 0:
-                    parts.append(f"handles {try_count} exception type{'s' if try_count > 1 else ''}")
-                if return_count > 1 and early_returns:
-                    parts.append("returns early on error")
-                elif return_count == 1:
-                    parts.append("single return point")
-
-                if parts:
-                    return ". ".join(parts) + "."
-                return ""
-        return ""
+        node = _build_function_index(ast.parse(source)).get(func_name)
     except SyntaxError:
         return ""
+    return _heuristic_summary(node) if node else ""
+
+
+def _has_early_return(node: ast.AST) -> bool:
+    """True if any return under ``node`` sits inside an if-branch."""
+    stack = [(child, False) for child in ast.iter_child_nodes(node)]
+    while stack:
+        child, in_if = stack.pop()
+        child_type = type(child)
+        if in_if and child_type is ast.Return:
+            return True
+        in_if = in_if or child_type is ast.If
+        stack.extend((grandchild, in_if) for grandchild in ast.iter_child_nodes(child))
+    return False
+
+
+def _heuristic_summary(node: ast.AST) -> str:
+    """Summarize a function node's loops, branches, handlers and returns."""
+    # Count patterns; Counter tallies node types without a Python-level loop
+    type_counts = Counter(map(type, ast.walk(node)))
+    loop_count = type_counts[ast.For] + type_counts[ast.AsyncFor] + type_counts[ast.While]
+    try_count = type_counts[ast.Try]
+    conditional_count = type_counts[ast.If]
+    return_count = type_counts[ast.Return]
+
+    # Only needed to tell early returns from multiple flat ones
+    early_returns = return_count > 1 and _has_early_return(node)
+
+    # Build summary parts
+    parts = []
+    if loop_count > 0:
+        parts.append(f"Iterates over {loop_count} collection{'s' if loop_count > 1 else ''}")
+    if conditional_count > 0:
+        parts.append(f"{conditional_count} decision branch{'es' if conditional_count > 1 else ''}")
+    if try_count > 0:
+        parts.append(f"handles {try_count} exception type{'s' if try_count > 1 else ''}")
+    if return_count > 1 and early_returns:
+        parts.append("returns early on error")
+    elif return_count == 1:
+        parts.append("single return point")
+
+    if parts:
+        return ". ".join(parts) + "."
+    return ""
+
+
+def _unique_hotspots(hotspots):
+    """
+    Yield (filepath, func_name, hotspot) for the first hotspot per (basename, function).
+
+    Entries missing a file or function are dropped. Duplicates (the same
+    function name in different paths) are filtered here, before any file
+    is read, and lazily so callers can stop early.
+    """
+    seen: Set[Tuple[str, str]] = set()
+    for hs in hotspots:
+        filepath = hs.get("file", "")
+        func_name = hs.get("function", "")
+        if not filepath or not func_name:
+            continue
+        key = (_basename(filepath), func_name)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield filepath, func_name, hs
 
 
 def generate_logic_maps(results: Dict[str, Any], n: int = 10) -> List[Dict[str, Any]]:
@@ -1678,46 +2011,34 @@ def generate_logic_maps(results: Dict[str, Any], n: int = 10) -> List[Dict[str,
         return []
 
     logic_maps = []
-    seen = set()  # Track to avoid duplicates
+    parsed_files: Dict[str, Any] = {}
 
     hotspots = results.get("hotspots", [])
     structure = results.get("structure", {})
     files = structure.get("files", {})
 
-    for hs in hotspots:
+    for filepath, func_name, hs in _unique_hotspots(hotspots):
         if len(logic_maps) >= n:
             break
 
-        filepath = hs.get("file", "")
-        func_name = hs.get("function", "")
-
-        if not filepath or not func_name:
-            continue
-
-        # Skip duplicates (same function name in different paths)
-        basename = Path(filepath).name
-        key = f"{basename}:{func_name}"
-        if key in seen:
-            continue
-        seen.add(key)
-
-        # Try to read the file and generate logic map
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                source = f.read()
-
-            generator = LogicMapGenerator(source)
-            if generator.parse():
-                logic_map = generator.generate_logic_map(func_name)
-                if logic_map:
-                    logic_map["file"] = filepath
-                    logic_map["complexity"] = hs.get("complexity", 0)
-                    # Add docstring and heuristic summary
-                    logic_map["docstring"] = _extract_function_docstring(source, func_name)
-                    logic_map["heuristic"] = _generate_heuristic_summary(source, func_name)
-                    logic_maps.append(logic_map)
-        except (IOError, OSError):
+        # Read and parse the file (shared with other gap features)
+        if filepath not in parsed_files:
+            parsed_files[filepath] = _parse_cached(filepath)
+        parsed = parsed_files[filepath]
+        if parsed is None:
             continue
+        source, tree, func_index = parsed
+
+        generator = LogicMapGenerator(source, tree=tree, func_index=func_index)
+        logic_map = generator.generate_logic_map(func_name)
+        if logic_map:
+            func_node = func_index[func_name]
+            logic_map["file"] = filepath
+            logic_map["complexity"] = hs.get("complexity", 0)
+            # Add docstring and heuristic summary
+            logic_map["docstring"] = _function_docstring(func_node)
+            logic_map["heuristic"] = _heuristic_summary(func_node)
+            logic_maps.append(logic_map)
 
     return logic_maps
 
@@ -1741,33 +2062,29 @@ def verify_imports(results: Dict[str, Any], target_dir: str) -> Dict[str, Any]:
 
     imports = results.get("imports", {})
     external_deps = imports.get("external_deps", [])
-    graph = imports.get("graph", {})
+    graph = _normalize_graph(imports.get("graph", {}))
+
+    # Internal modules and declared external deps both count as resolved
+    known_modules = set(graph.keys())
+    known_modules.update(external_deps)
 
-    # Build set of all known internal modules
-    internal_modules = set(graph.keys())
+    passed = 0
+    warnings = verification["warnings"]
 
     # Check each module's imports
     for module, mod_data in graph.items():
-        # Handle both dict format {'imports': [...]} and list format [...]
-        if isinstance(mod_data, dict):
-            module_imports = mod_data.get("imports", [])
-        else:
-            module_imports = mod_data if isinstance(mod_data, list) else []
-
-        for imp in module_imports:
-            # Internal imports are generally OK
-            if imp in internal_modules:
-                verification["passed"] += 1
-            elif imp in external_deps:
-                verification["passed"] += 1
+        for imp in mod_data.get("imports", ()):
+            if imp in known_modules:
+                passed += 1
             else:
                 # Could be a relative import or missing
-                verification["warnings"].append({
+                warnings.append({
                     "module": module,
                     "import": imp,
                     "issue": "Cannot verify - may be dynamic or conditional"
                 })
 
+    verification["passed"] = passed
     return verification
 
 
@@ -1787,7 +2104,7 @@ def get_layer_details(results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]
         layers = raw_tiers
     else:
         layers = _normalize_layers(imports.get("layers", {}))
-    graph = imports.get("graph", {})
+    graph = _normalize_graph(imports.get("graph", {}))
 
     detailed_layers = {}
 
@@ -1799,20 +2116,11 @@ def get_layer_details(results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]
             else:
                 mod_name = mod
 
-            # Get module data from graph - handles both dict and list formats
             mod_data = graph.get(mod_name, {})
-            if isinstance(mod_data, dict):
-                imported_by_count = len(mod_data.get("imported_by", []))
-                imports_count = len(mod_data.get("imports", []))
-            else:
-                # Fallback for list format
-                imported_by_count = 0
-                imports_count = len(mod_data) if isinstance(mod_data, list) else 0
-
             detailed_modules.append({
                 "module": mod_name,
-                "imported_by": imported_by_count,
-                "imports": imports_count
+                "imported_by": len(mod_data.get("imported_by", ())),
+                "imports": len(mod_data.get("imports", ()))
             })
 
         # Sort by imported_by count
@@ -1826,6 +2134,39 @@ def get_layer_details(results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]
 # Architecture Prose Generation
 # =============================================================================
 
+# Filename substrings (matched on the lower-cased path) for each component kind
+_PROSE_COMPONENT_MATCHERS = tuple(
+    (kind, _substring_matcher(set(patterns)))
+    for kind, patterns in (
+        ("agent", ("agent",)),
+        ("workflow", ("workflow", "pipeline", "orchestrat")),
+        ("api", ("api", "handler", "endpoint", "route")),
+        ("cli", ("cli", "command", "argparse")),
+        ("model", ("model", "schema", "entity")),
+    )
+)
+
+_PROSE_TEST_EXTENSIONS = ('.test.ts', '.test.js', '.test.tsx', '.test.jsx',
+                          '.spec.ts', '.spec.js', '.spec.tsx', '.spec.jsx')
+
+
+def _count_prose_components(files) -> Dict[str, int]:
+    """Count files per component kind (plus "test"), lower-casing each path once."""
+    counts = dict.fromkeys([kind for kind, _ in _PROSE_COMPONENT_MATCHERS], 0)
+    counts["test"] = 0
+    for f in files:
+        lowered = f.lower()
+        for kind, match in _PROSE_COMPONENT_MATCHERS:
+            if match(lowered):
+                counts[kind] += 1
+        # Actual test files, not configs
+        if (lowered.endswith(_PROSE_TEST_EXTENSIONS)
+                or '/test_' in f or '/tests/' in lowered or '\\test_' in f
+                or lowered.endswith('_test.py')):
+            counts["test"] += 1
+    return counts
+
+
 def generate_prose(results: Dict[str, Any], project_name: str = "Project") -> str:
     """
     Generate natural language architecture overview.
@@ -1847,50 +2188,29 @@ def generate_prose(results: Dict[str, Any], project_name: str = "Project") -> st
     structure = results.get("structure", {})
     files = structure.get("files", {})
 
-    # Check for agents
-    agent_files = [f for f in files if "agent" in f.lower()]
-    if agent_files:
+    counts = _count_prose_components(files)
+
+    if counts["agent"]:
         patterns.append("agent-based architecture")
-        agent_count = len(agent_files)
-        pattern_details.append(f"**{agent_count} agent modules** for autonomous task execution")
+        pattern_details.append(f"**{counts['agent']} agent modules** for autonomous task execution")
 
-    # Check for workflows
-    workflow_files = [f for f in files if any(w in f.lower() for w in ["workflow", "pipeline", "orchestrat"])]
-    if workflow_files:
+    if counts["workflow"]:
         patterns.append("workflow orchestration")
-        workflow_count = len(workflow_files)
-        pattern_details.append(f"**{workflow_count} workflow modules** for process coordination")
+        pattern_details.append(f"**{counts['workflow']} workflow modules** for process coordination")
 
-    # Check for API
-    api_files = [f for f in files if any(a in f.lower() for a in ["api", "handler", "endpoint", "route"])]
-    if api_files:
+    if counts["api"]:
         patterns.append("REST/HTTP API")
-        api_count = len(api_files)
-        pattern_details.append(f"**{api_count} API handlers** for external integration")
+        pattern_details.append(f"**{counts['api']} API handlers** for external integration")
 
-    # Check for CLI
-    cli_files = [f for f in files if any(c in f.lower() for c in ["cli", "command", "argparse"])]
-    if cli_files:
+    if counts["cli"]:
         patterns.append("command-line interface")
-        cli_count = len(cli_files)
-        pattern_details.append(f"**{cli_count} CLI modules** for user interaction")
-
-    # Check for data models
-    model_files = [f for f in files if any(m in f.lower() for m in ["model", "schema", "entity"])]
-    if model_files:
-        model_count = len(model_files)
-        pattern_details.append(f"**{model_count} data model definitions**")
-
-    # Check for tests (actual test files, not configs)
-    test_extensions = ('.test.ts', '.test.js', '.test.tsx', '.test.jsx',
-                       '.spec.ts', '.spec.js', '.spec.tsx', '.spec.jsx')
-    test_files = [f for f in files
-                  if (any(f.lower().endswith(ext) for ext in test_extensions)
-                      or '/test_' in f or '/tests/' in f.lower() or '\\test_' in f
-                      or f.lower().endswith('_test.py'))]
-    if test_files:
-        test_count = len(test_files)
-        pattern_details.append(f"**{test_count} test modules** for validation")
+        pattern_details.append(f"**{counts['cli']} CLI modules** for user interaction")
+
+    if counts["model"]:
+        pattern_details.append(f"**{counts['model']} data model definitions**")
+
+    if counts["test"]:
+        pattern_details.append(f"**{counts['test']} test modules** for validation")
 
     # Build prose
     total_files = summary.get("total_files", 0)
@@ -1932,6 +2252,26 @@ def generate_prose(results: Dict[str, Any], project_name: str = "Project") -> st
 # State Mutations
 # =============================================================================
 
+def _self_assignments(func_node: ast.AST) -> List[str]:
+    """
+    Distinct ``self.X`` assignment targets in a function body, in source order.
+
+    Only the body statements are traversed (explicit stack, no ast.walk over
+    decorators and signature), and targets are deduplicated as they are found.
+    """
+    found: Dict[str, None] = {}
+    stack = func_node.body[::-1]
+    while stack:
+        child = stack.pop()
+        if type(child) is ast.Assign:
+            for target in child.targets:
+                if (type(target) is ast.Attribute and type(target.value) is ast.Name
+                        and target.value.id == "self"):
+                    found[f"self.{target.attr}"] = None
+        stack.extend(reversed(list(ast.iter_child_nodes(child))))
+    return list(found)
+
+
 def extract_state_mutations(results: Dict[str, Any]) -> Dict[str, List[str]]:
     """
     Extract state mutations (self.X = Y assignments) from complex functions.
@@ -1947,7 +2287,7 @@ def extract_state_mutations(results: Dict[str, Any]) -> Dict[str, List[str]]:
         for cls_info in structure.get("classes", []):
             cls_name = cls_info.get("name", "")
             filepath = cls_info.get("file", "")
-            basename = Path(filepath).name if filepath else ""
+            basename = _basename(filepath)
             for mut in cls_info.get("state_mutations", []):
                 prop = mut.get("property", "")
                 method = mut.get("method", "")
@@ -1962,6 +2302,7 @@ def extract_state_mutations(results: Dict[str, Any]) -> Dict[str, List[str]]:
     hotspots = results.get("hotspots", [])[:20]
     structure = results.get("structure", {})
     files = structure.get("files", {})
+    parsed_files: Dict[str, Any] = {}
 
     for hs in hotspots:
         filepath = hs.get("file", "")
@@ -1970,32 +2311,24 @@ def extract_state_mutations(results: Dict[str, Any]) -> Dict[str, List[str]]:
         if not filepath or not func_name:
             continue
 
-        # Try to read and parse file
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                source = f.read()
-
-            tree = ast.parse(source)
+        # Read and parse file (shared with other gap features)
+        if filepath not in parsed_files:
+            parsed_files[filepath] = _parse_cached(filepath)
+        parsed = parsed_files[filepath]
+        if parsed is None:
+            continue
+        func_index = parsed[2]
 
-            # Find the function
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                    if node.name == func_name:
-                        func_mutations = []
-                        for child in ast.walk(node):
-                            if isinstance(child, ast.Assign):
-                                for target in child.targets:
-                                    if isinstance(target, ast.Attribute):
-                                        if isinstance(target.value, ast.Name) and target.value.id == "self":
-                                            func_mutations.append(f"self.{target.attr}")
-
-                        if func_mutations:
-                            key = f"{Path(filepath).name}:{func_name}"
-                            mutations[key] = list(set(func_mutations))
-                        break
-        except (IOError, OSError, SyntaxError):
+        # Find the function
+        node = func_index.get(func_name)
+        if node is None:
             continue
 
+        func_mutations = _self_assignments(node)
+        if func_mutations:
+            key = f"{_basename(filepath)}:{func_name}"
+            mutations[key] = func_mutations
+
     return mutations
 
 
@@ -2049,69 +2382,91 @@ def generate_verify_commands(results: Dict[str, Any], project_name: str = "proje
 # Inline Skeleton Formatting
 # =============================================================================
 
-def _extract_class_docstring(filepath: str, class_name: str, start_line: int) -> Optional[str]:
-    """Extract docstring for a class from source file."""
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            source = f.read()
+def _class_docstring(node: ast.ClassDef) -> Optional[str]:
+    """First sentence of a class node's docstring, or None."""
+    if (node.body and isinstance(node.body[0], ast.Expr) and
+        isinstance(node.body[0].value, ast.Constant) and
+        isinstance(node.body[0].value.value, str)):
+        docstring = node.body[0].value.value
+        # Return first sentence only
+        first_sentence = docstring.split('.')[0].strip()
+        if first_sentence:
+            return first_sentence + "."
+    return None
 
-        tree = ast.parse(source)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.name == class_name:
-                # Get docstring
-                if (node.body and isinstance(node.body[0], ast.Expr) and
-                    isinstance(node.body[0].value, ast.Constant) and
-                    isinstance(node.body[0].value.value, str)):
-                    docstring = node.body[0].value.value
-                    # Return first sentence only
-                    first_sentence = docstring.split('.')[0].strip()
-                    if first_sentence:
-                        return first_sentence + "."
-                return None
-    except (IOError, OSError, SyntaxError):
-        pass
+
+def _find_init(node: ast.ClassDef) -> Optional[ast.FunctionDef]:
+    """The class's own __init__ definition, or None."""
+    for item in node.body:
+        if isinstance(item, ast.FunctionDef) and item.name == "__init__":
+            return item
     return None
 
 
+def _annotation_text(node: ast.AST) -> str:
+    """
+    Source text for an annotation, same as ``ast.unparse``.
+
+    Names, dotted names and subscripts of those (``Dict[str, List[int]]``)
+    cover nearly all annotations and are formatted directly; anything else
+    goes through the generic unparser.
+    """
+    node_type = type(node)
+    if node_type is ast.Name:
+        return node.id
+    if node_type is ast.Attribute and type(node.value) in (ast.Name, ast.Attribute):
+        return f"{_annotation_text(node.value)}.{node.attr}"
+    if node_type is ast.Subscript and type(node.value) in (ast.Name, ast.Attribute):
+        index = node.slice
+        if type(index) is ast.Tuple and len(index.elts) > 1:
+            inner = ", ".join(map(_annotation_text, index.elts))
+        elif type(index) in (ast.Name, ast.Attribute, ast.Subscript):
+            inner = _annotation_text(index)
+        else:
+            return ast.unparse(node)
+        return f"{_annotation_text(node.value)}[{inner}]"
+    return ast.unparse(node)
+
+
+def _init_signature(init: ast.FunctionDef) -> str:
+    """Signature string for an __init__ node (annotations kept, defaults dropped)."""
+    # Build signature string
+    args = []
+    for arg in init.args.args:
+        if arg.arg == "self":
+            continue
+        arg_str = arg.arg
+        if arg.annotation:
+            try:
+                arg_str += f": {_annotation_text(arg.annotation)}"
+            except:
+                pass
+        args.append(arg_str)
+
+    # Add defaults for keyword-only args
+    for arg in init.args.kwonlyargs:
+        arg_str = arg.arg
+        if arg.annotation:
+            try:
+                arg_str += f": {_annotation_text(arg.annotation)}"
+            except:
+                pass
+        args.append(arg_str)
+
+    return f"def __init__(self, {', '.join(args)})"
+
+
+def _extract_class_docstring(filepath: str, class_name: str, start_line: int) -> Optional[str]:
+    """Extract docstring for a class from source file."""
+    node = _find_class(filepath, class_name)
+    return _class_docstring(node) if node else None
+
+
 def _extract_init_signature(filepath: str, class_name: str) -> Optional[str]:
     """Extract __init__ method signature from source file."""
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            source = f.read()
-
-        tree = ast.parse(source)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.name == class_name:
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef) and item.name == "__init__":
-                        # Build signature string
-                        args = []
-                        for arg in item.args.args:
-                            if arg.arg == "self":
-                                continue
-                            arg_str = arg.arg
-                            if arg.annotation:
-                                try:
-                                    arg_str += f": {ast.unparse(arg.annotation)}"
-                                except:
-                                    pass
-                            args.append(arg_str)
-
-                        # Add defaults for keyword-only args
-                        for arg in item.args.kwonlyargs:
-                            arg_str = arg.arg
-                            if arg.annotation:
-                                try:
-                                    arg_str += f": {ast.unparse(arg.annotation)}"
-                                except:
-                                    pass
-                            args.append(arg_str)
-
-                        return f"def __init__(self, {', '.join(args)})"
-                return None
-    except (IOError, OSError, SyntaxError):
-        pass
-    return None
+    node = _find_class(filepath, class_name)
+    init = _find_init(node) if node else None
+    return _init_signature(init) if init else None
 
 
 def _get_instance_var_repr(node: ast.AST) -> str:
@@ -2159,46 +2514,37 @@ def _extract_instance_vars(filepath: str, class_name: str) -> List[Dict[str, Any
 
     Returns list of instance variables with their assigned values.
     """
-    instance_vars = []
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            source = f.read()
+    node = _find_class(filepath, class_name)
+    init = _find_init(node) if node else None
+    return _init_instance_vars(init) if init else []
 
-        tree = ast.parse(source)
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.name == class_name:
-                # Find __init__ method
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef) and item.name == "__init__":
-                        # Walk through __init__ body to find self.x = y assignments
-                        for stmt in ast.walk(item):
-                            if isinstance(stmt, ast.Assign):
-                                for target in stmt.targets:
-                                    if isinstance(target, ast.Attribute):
-                                        if isinstance(target.value, ast.Name) and target.value.id == "self":
-                                            var_name = target.attr
-                                            var_value = _get_instance_var_repr(stmt.value)
-                                            instance_vars.append({
-                                                "name": var_name,
-                                                "value": var_value,
-                                                "line": stmt.lineno
-                                            })
-                            # Also handle augmented assignments (self.x += y) - rare but possible
-                            elif isinstance(stmt, ast.AugAssign):
-                                if isinstance(stmt.target, ast.Attribute):
-                                    if isinstance(stmt.target.value, ast.Name) and stmt.target.value.id == "self":
-                                        var_name = stmt.target.attr
-                                        instance_vars.append({
-                                            "name": var_name,
-                                            "value": "...",  # Can't determine initial value
-                                            "line": stmt.lineno
-                                        })
-                        break  # Found __init__, stop searching
-                break  # Found class, stop searching
-
-    except (IOError, OSError, SyntaxError):
-        pass
+def _init_instance_vars(init: ast.FunctionDef) -> List[Dict[str, Any]]:
+    """``self.x = y`` / ``self.x += y`` targets in an __init__ node, first per name."""
+    instance_vars = []
+    # Walk through __init__ body to find self.x = y assignments
+    for stmt in ast.walk(init):
+        if isinstance(stmt, ast.Assign):
+            for target in stmt.targets:
+                if isinstance(target, ast.Attribute):
+                    if isinstance(target.value, ast.Name) and target.value.id == "self":
+                        var_name = target.attr
+                        var_value = _get_instance_var_repr(stmt.value)
+                        instance_vars.append({
+                            "name": var_name,
+                            "value": var_value,
+                            "line": stmt.lineno
+                        })
+        # Also handle augmented assignments (self.x += y) - rare but possible
+        elif isinstance(stmt, ast.AugAssign):
+            if isinstance(stmt.target, ast.Attribute):
+                if isinstance(stmt.target.value, ast.Name) and stmt.target.value.id == "self":
+                    var_name = stmt.target.attr
+                    instance_vars.append({
+                        "name": var_name,
+                        "value": "...",  # Can't determine initial value
+                        "line": stmt.lineno
+                    })
 
     # Deduplicate by name (keep first occurrence)
     seen = set()
@@ -2211,6 +2557,71 @@ def _extract_instance_vars(filepath: str, class_name: str) -> List[Dict[str, Any
     return unique_vars
 
 
+def _extract_class_info(filepath: str, class_name: str
+                        ) -> Tuple[Optional[str], Optional[str], List[Dict[str, Any]]]:
+    """
+    (docstring, __init__ signature, instance vars) for a class in one lookup.
+
+    The class node is found once and its body scanned once for __init__,
+    instead of once per extractor.
+    """
+    node = _find_class(filepath, class_name)
+    if node is None:
+        return None, None, []
+    init = _find_init(node)
+    if init is None:
+        return _class_docstring(node), None, []
+    return _class_docstring(node), _init_signature(init), _init_instance_vars(init)
+
+
+# Base class patterns that indicate architectural importance
+IMPORTANT_BASES = {
+    "Agent": 30, "BaseAgent": 30,
+    "BaseModel": 20, "Model": 15,
+    "BaseExecutor": 25, "Executor": 20,
+    "BaseProcessor": 20, "Processor": 15,
+    "BaseHandler": 15, "Handler": 10,
+    "ABC": 15,  # Abstract base classes
+    "Protocol": 15,  # Protocol classes
+}
+
+_match_important_base = _substring_matcher(set(IMPORTANT_BASES))
+
+
+@functools.lru_cache(maxsize=1024)
+def _base_bonus(base: str) -> int:
+    """
+    Bonus of the first IMPORTANT_BASES pattern (in dict order) found in ``base``.
+
+    Base names repeat heavily across classes, so results are memoized; one
+    compiled scan rejects bases that match no pattern at all.
+    """
+    if not _match_important_base(base):
+        return 0
+    for pattern, bonus in IMPORTANT_BASES.items():
+        if pattern in base:
+            return bonus
+    return 0
+
+
+_SKELETON_ROOT_MARKERS = ("/kosmos/", "/src/", "/lib/")
+
+
+def _skeleton_module_path(filepath: str) -> str:
+    """
+    Dotted module path from the first kosmos/src/lib component on, else the stem.
+
+    Works on the joined string: bracketing the path with "/" makes each
+    marker match only a whole component, and the smallest hit is the first
+    such component.
+    """
+    path = "/" + filepath.replace("\\", "/") + "/"
+    hits = [i for i in map(path.find, _SKELETON_ROOT_MARKERS) if i >= 0]
+    if not hits:
+        return _stem(filepath)
+    return path[min(hits) + 1:-1].replace("/", ".").replace(".py", "")
+
+
 def format_inline_skeletons(results: Dict[str, Any], n: int = 10) -> List[Dict[str, Any]]:
     """
     Get top N critical classes for inline skeleton display.
@@ -2237,49 +2648,28 @@ def format_inline_skeletons(results: Dict[str, Any], n: int = 10) -> List[Dict[s
         # Map module name to import count
         file_import_weight[mod_name] = imported_by_count
 
-    # Base class patterns that indicate architectural importance
-    IMPORTANT_BASES = {
-        "Agent": 30, "BaseAgent": 30,
-        "BaseModel": 20, "Model": 15,
-        "BaseExecutor": 25, "Executor": 20,
-        "BaseProcessor": 20, "Processor": 15,
-        "BaseHandler": 15, "Handler": 10,
-        "ABC": 15,  # Abstract base classes
-        "Protocol": 15,  # Protocol classes
+    # Import weight per file, resolved through its module path up front
+    file_weights = {
+        filepath: file_import_weight.get(_skeleton_module_path(filepath), 0)
+        for filepath in files
     }
 
-    # Collect all classes with metadata, tracking full paths to avoid duplicates
-    seen_paths = set()
-    all_classes = []
+    # Score every class, keeping only the inputs needed to build its entry;
+    # full dicts (and their source extraction) are made for the top n only
+    candidates: Dict[Tuple[str, str], Tuple] = {}
     for filepath, data in files.items():
-        # Get import weight for this file
-        # Convert filepath to module format for lookup
-        path_parts = filepath.replace("\\", "/").split("/")
-        for i, part in enumerate(path_parts):
-            if part in ("kosmos", "src", "lib"):
-                mod_path = ".".join(path_parts[i:]).replace(".py", "")
-                break
-        else:
-            mod_path = Path(filepath).stem
-
-        import_weight = file_import_weight.get(mod_path, 0)
+        import_weight = file_weights[filepath]
 
         for cls in data.get("classes", []):
             cls_name = cls.get("name", "Unknown")
-            # Use full path to avoid duplicates
-            full_id = f"{filepath}:{cls_name}"
-            if full_id in seen_paths:
+            # Key on full path to avoid duplicates
+            full_id = (filepath, cls_name)
+            if full_id in candidates:
                 continue
-            seen_paths.add(full_id)
 
             # Calculate base class bonus
             bases = cls.get("bases", [])
-            base_bonus = 0
-            for base in bases:
-                for pattern, bonus in IMPORTANT_BASES.items():
-                    if pattern in base:
-                        base_bonus = max(base_bonus, bonus)
-                        break
+            base_bonus = max(map(_base_bonus, bases), default=0)
 
             # Calculate complexity from methods
             methods = cls.get("methods", [])
@@ -2297,41 +2687,35 @@ def format_inline_skeletons(results: Dict[str, Any], n: int = 10) -> List[Dict[s
                 min(method_count, 50) * 0.4 +     # Method count (max 20)
                 min(method_complexity, 200) * 0.1  # Complexity (max 20)
             )
+            candidates[full_id] = (round(score, 2), cls, bases, methods, method_count)
 
-            # Extract docstring from structure or source file
-            docstring = cls.get("docstring")
-            if not docstring:
-                docstring = _extract_class_docstring(filepath, cls_name, cls.get("start_line", 0))
-
-            # Extract __init__ signature
-            init_sig = _extract_init_signature(filepath, cls_name)
+    # Top n by importance score; nlargest matches a stable descending sort
+    # (ties keep file order) without sorting every class
+    top = heapq.nlargest(n, candidates.items(), key=lambda item: item[1][0])
 
-            # Extract instance variables from __init__
-            instance_vars = _extract_instance_vars(filepath, cls_name)
-
-            all_classes.append({
-                "name": cls_name,
-                "file": filepath,
-                "line": cls.get("start_line", cls.get("line", 0)),
-                "bases": bases,
-                "methods": methods,
-                "fields": cls.get("fields", []),
-                "decorators": cls.get("decorators", []),
-                "method_count": method_count,
-                "importance_score": round(score, 2),
-                "docstring": docstring,
-                "init_signature": init_sig,
-                "instance_vars": instance_vars
-            })
+    skeletons = []
+    for (filepath, cls_name), (_, cls, bases, methods, method_count) in top:
 
-    # Sort by importance score descending
-    all_classes.sort(key=lambda x: x["importance_score"], reverse=True)
+        # Docstring (structure's, else source's), __init__ signature and
+        # instance variables, from one class lookup
+        source_doc, init_sig, instance_vars = _extract_class_info(filepath, cls_name)
+        docstring = cls.get("docstring") or source_doc
 
-    # Remove internal score from output
-    for cls in all_classes:
-        cls.pop("importance_score", None)
+        skeletons.append({
+            "name": cls_name,
+            "file": filepath,
+            "line": cls.get("start_line", cls.get("line", 0)),
+            "bases": bases,
+            "methods": methods,
+            "fields": cls.get("fields", []),
+            "decorators": cls.get("decorators", []),
+            "method_count": method_count,
+            "docstring": docstring,
+            "init_signature": init_sig,
+            "instance_vars": instance_vars
+        })
 
-    return all_classes[:n]
+    return skeletons
 
 
 # =============================================================================
@@ -2514,10 +2898,17 @@ def _extract_env_vars_from_file_ast(filepath: str) -> List[Dict[str, Any]]:
     env_vars = []
     seen_lines = set()  # Deduplicate BoolOp + nested Call double-counting
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            source = f.read()
+        with open(filepath, "rb") as f:
+            data = f.read()
 
-        tree = ast.parse(source)
+        # Every detected form names getenv or environ; most files mention
+        # neither, and one scan of the raw bytes is far cheaper than
+        # decode + parse + walk
+        if b"environ" not in data and b"getenv" not in data:
+            return env_vars
+
+        source = data.decode("utf-8")
+        tree = parse_source(source)
 
         for node in ast.walk(tree):
             # Detect `os.getenv('X') or 'default'` patterns (BoolOp with Or)
@@ -2645,7 +3036,7 @@ def get_environment_variables(results: Dict[str, Any]) -> List[Dict[str, Any]]:
     other_files = []
 
     for filepath in files.keys():
-        fname = Path(filepath).name.lower()
+        fname = _basename(filepath).lower()
         if any(kw in fname for kw in ["config", "env", "settings", "setup", "provider"]):
             priority_files.append(filepath)
         else:
@@ -3066,6 +3457,22 @@ DIRECTORY_HAZARDS = {
 }
 
 
+def _list_subdirs(path: str) -> List[str]:
+    """Names of directories (including symlinks to them) directly under ``path``."""
+    names = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return names
+
+
 def get_directory_hazards(target_dir: str) -> List[Dict[str, Any]]:
     """
     Detect directories that should be skipped to avoid wasting context.
@@ -3077,27 +3484,36 @@ def get_directory_hazards(target_dir: str) -> List[Dict[str, Any]]:
         List of hazardous directories found with recommendations.
     """
     hazards = []
-    target_path = Path(target_dir)
+
+    # One listing of the root and one of each top-level directory replaces
+    # a glob (or stat) per pattern per directory
+    root_dirs = _list_subdirs(target_dir)
+    root_names = {os.path.normcase(name) for name in root_dirs}
+    child_names = [
+        (name, {os.path.normcase(child) for child in _list_subdirs(os.path.join(target_dir, name))})
+        for name in root_dirs
+    ]
 
     for pattern, recommendation in DIRECTORY_HAZARDS.items():
         if "*" in pattern:
-            # Glob pattern
-            matches = list(target_path.glob(pattern))
-            for match in matches:
-                if match.is_dir():
-                    hazards.append({
-                        "directory": str(match.relative_to(target_path)),
-                        "recommendation": recommendation
-                    })
+            # Glob pattern - root level only
+            for name in fnmatch.filter(root_dirs, pattern):
+                hazards.append({
+                    "directory": name,
+                    "recommendation": recommendation
+                })
         else:
-            # Exact match - check root and one level deep
-            for search_path in [target_path / pattern, *target_path.glob(f"*/{pattern}")]:
-                if search_path.is_dir():
-                    hazards.append({
-                        "directory": str(search_path.relative_to(target_path)),
-                        "recommendation": recommendation
-                    })
-                    break  # Only include once per pattern
+            # Exact match - check root and one level deep, include once per pattern
+            if pattern in root_names:
+                found = pattern
+            else:
+                found = next((os.path.join(name, pattern)
+                              for name, children in child_names if pattern in children), None)
+            if found:
+                hazards.append({
+                    "directory": found,
+                    "recommendation": recommendation
+                })
 
     # Sort by directory name
     hazards.sort(key=lambda x: x["directory"])
@@ -3116,6 +3532,54 @@ PROMPT_PATTERNS = [
     "PROMPT_TEMPLATE", "DEFAULT_PROMPT", "BASE_PROMPT"
 ]
 
+# Any PROMPT_PATTERNS substring in a variable name, as one compiled scan
+_PROMPT_NAME_RE = re.compile("|".join(map(re.escape, PROMPT_PATTERNS)))
+_PROMPT_NAME_BYTES_RE = re.compile(_PROMPT_NAME_RE.pattern.encode())
+
+
+def _is_agent_class(node: ast.ClassDef) -> bool:
+    """True if any base class name (``Agent``, ``BaseAgent``, ``pkg.MyAgent``) contains "Agent"."""
+    for base in node.bases:
+        if type(base) is ast.Name:
+            name = base.id
+        elif type(base) is ast.Attribute:
+            name = base.attr
+        else:
+            continue
+        if "Agent" in name:
+            return True
+    return False
+
+
+def _prompt_constant(node: ast.Assign):
+    """Yield (var_name, text) for prompt-like names assigned a string of 100+ chars."""
+    value = node.value
+    if type(value) is not ast.Constant or type(value.value) is not str or len(value.value) <= 100:
+        return
+    for target in node.targets:
+        if type(target) is ast.Name and _PROMPT_NAME_RE.search(target.id):
+            yield target.id, value.value
+
+
+def _iter_prompt_constants(tree: ast.AST):
+    """
+    Yield (agent class or None, var_name, prompt_text) in one ast.walk.
+
+    Plain assignments anywhere yield with class None. Assignments directly
+    in the body of an Agent-derived class also yield with that class, and
+    do so first, since ast.walk visits a class before its body.
+    """
+    for node in ast.walk(tree):
+        node_type = type(node)
+        if node_type is ast.Assign:
+            for var_name, text in _prompt_constant(node):
+                yield None, var_name, text
+        elif node_type is ast.ClassDef and _is_agent_class(node):
+            for item in node.body:
+                if type(item) is ast.Assign:
+                    for var_name, text in _prompt_constant(item):
+                        yield node, var_name, text
+
 
 def find_agent_prompts(target_dir: str, results: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
@@ -3186,58 +3650,34 @@ def find_agent_prompts(target_dir: str, results: Dict[str, Any]) -> List[Dict[st
             continue
 
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                source = f.read()
+            with open(filepath, "rb") as f:
+                data = f.read()
 
-            tree = ast.parse(source)
+            # No prompt-like name anywhere in the file means nothing to parse for
+            if not _PROMPT_NAME_BYTES_RE.search(data):
+                continue
+
+            tree = parse_source(data.decode("utf-8"))
 
-            # Look for string assignments to prompt-like variables
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Assign):
-                    for target in node.targets:
-                        if isinstance(target, ast.Name):
-                            var_name = target.id
-                            # Check if it matches prompt patterns
-                            if any(pattern in var_name for pattern in PROMPT_PATTERNS):
-                                if (isinstance(node.value, ast.Constant) and
-                                    isinstance(node.value.value, str) and
-                                    len(node.value.value) > 100):
-                                    prompt_text = node.value.value
-                                    # Extract first paragraph
-                                    first_para = prompt_text.split("\n\n")[0].strip()
-                                    agent_name = Path(filepath).stem.replace("_", " ").title()
-                                    if agent_name not in seen_agents:
-                                        seen_agents.add(agent_name)
-                                        personas.append({
-                                            "agent": agent_name,
-                                            "summary": first_para[:200] + ("..." if len(first_para) > 200 else ""),
-                                            "source": f"{Path(filepath).name}:{var_name}",
-                                            "type": "constant"
-                                        })
-
-                # Also check for class attributes in agent classes
-                elif isinstance(node, ast.ClassDef):
-                    if any(base in str(node.bases) for base in ["Agent", "BaseAgent"]):
-                        for item in node.body:
-                            if isinstance(item, ast.Assign):
-                                for target in item.targets:
-                                    if isinstance(target, ast.Name):
-                                        var_name = target.id
-                                        if any(pattern in var_name for pattern in PROMPT_PATTERNS):
-                                            if (isinstance(item.value, ast.Constant) and
-                                                isinstance(item.value.value, str) and
-                                                len(item.value.value) > 100):
-                                                prompt_text = item.value.value
-                                                first_para = prompt_text.split("\n\n")[0].strip()
-                                                agent_name = node.name.replace("Agent", "")
-                                                if agent_name not in seen_agents:
-                                                    seen_agents.add(agent_name)
-                                                    personas.append({
-                                                        "agent": agent_name,
-                                                        "summary": first_para[:200] + ("..." if len(first_para) > 200 else ""),
-                                                        "source": f"{Path(filepath).name}:{node.name}.{var_name}",
-                                                        "type": "class"
-                                                    })
+            for cls, var_name, prompt_text in _iter_prompt_constants(tree):
+                # Extract first paragraph
+                first_para = prompt_text.split("\n\n")[0].strip()
+                if cls is None:
+                    agent_name = _stem(filepath).replace("_", " ").title()
+                    source_ref = f"{_basename(filepath)}:{var_name}"
+                    kind = "constant"
+                else:
+                    agent_name = cls.name.replace("Agent", "")
+                    source_ref = f"{_basename(filepath)}:{cls.name}.{var_name}"
+                    kind = "class"
+                if agent_name not in seen_agents:
+                    seen_agents.add(agent_name)
+                    personas.append({
+                        "agent": agent_name,
+                        "summary": first_para[:200] + ("..." if len(first_para) > 200 else ""),
+                        "source": source_ref,
+                        "type": kind
+                    })
 
         except (IOError, OSError, SyntaxError):
             continue
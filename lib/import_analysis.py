@@ -16,11 +16,13 @@ Usage:
 """
 
 import ast
+import functools
+import heapq
 import json
 import os
+import re
 import sys
-from collections import Counter, defaultdict, deque
-from pathlib import Path
+from collections import Counter, defaultdict
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 
@@ -51,6 +53,17 @@ ENTRY_POINT_PATTERNS = {
 # Layer detection keywords
 ORCHESTRATION_KEYWORDS = ["manager", "orchestrator", "coordinator", "workflow", "pipeline", "factory", "runner"]
 FOUNDATION_KEYWORDS = ["util", "utils", "base", "common", "helper", "abstract", "config", "constants"]
+# Sample files kept per alias; usage_count still counts every file
+ALIAS_SAMPLE_FILES = 5
+
+_ORCHESTRATION_RE = re.compile("|".join(map(re.escape, ORCHESTRATION_KEYWORDS)))
+_FOUNDATION_RE = re.compile("|".join(map(re.escape, FOUNDATION_KEYWORDS)))
+
+# Orphan confidence by filename keyword, checked in order (first hit wins)
+ORPHAN_FILENAME_CONFIDENCE = (
+    (("deprecated", "legacy", "old"), 0.95),
+    (("util", "helper"), 0.7),
+)
 
 
 # =============================================================================
@@ -61,26 +74,55 @@ def parse_imports_with_aliases(filepath: str) -> Dict[str, Any]:
     """
     Parse imports from a Python file with alias tracking.
 
+    Results are memoized per (path, mtime, size): root detection, the
+    import graph and alias analysis all parse the same files, so only
+    the first pass pays for the parse. Callers must not mutate the result.
+
     Returns:
         {
             "imports": ["pandas", "numpy", ...],
             "aliases": {"pd": "pandas", "np": "numpy"},
             "from_imports": {"os.path": ["join", "exists"]},
             "relative_imports": [".utils", "..core"],
-            "all_modules": ["pandas", "numpy", "os.path", ...]
+            "all_modules": ["pandas", "numpy", "os.path", ...],
+            "has_main_guard": bool  # source contains an `if __name__ ==` check
         }
     """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return _parse_imports_uncached(filepath)
+    return _parse_imports_cached(filepath, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_imports_cached(filepath: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """parse_imports_with_aliases memo; stat info in the key invalidates edits."""
+    return _parse_imports_uncached(filepath)
+
+
+def _parse_imports_uncached(filepath: str) -> Dict[str, Any]:
+    """Read and parse one file's imports (see parse_imports_with_aliases)."""
     result = {
         "imports": [],
         "aliases": {},
         "from_imports": defaultdict(list),
         "relative_imports": [],
-        "all_modules": []
+        "all_modules": [],
+        "has_main_guard": False
     }
 
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            tree = ast.parse(f.read())
+            source = f.read()
+    except Exception:
+        return result
+
+    # Text check rather than AST, so scripts that fail to parse still count
+    result["has_main_guard"] = 'if __name__ ==' in source or "if __name__==" in source
+
+    try:
+        tree = ast.parse(source)
     except Exception:
         return result
 
@@ -185,12 +227,14 @@ def auto_detect_root_package(
     # Find potential packages
     potential_packages = set()
     try:
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            if os.path.isdir(item_path) and not item.startswith("."):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
                 try:
-                    if (Path(item_path) / "__init__.py").exists():
-                        potential_packages.add(item)
+                    # DirEntry.is_dir() uses the type from readdir; it only stats symlinks
+                    if entry.is_dir() and os.path.exists(os.path.join(entry.path, "__init__.py")):
+                        potential_packages.add(entry.name)
                 except (PermissionError, OSError):
                     pass
     except Exception:
@@ -199,16 +243,21 @@ def auto_detect_root_package(
     if not potential_packages:
         return None
 
-    # Count imports
+    # Count imports, and .py files per top-level package for the fallback
     import_counts: Counter = Counter()
+    pkg_py_counts: Counter = Counter()
 
     for root, dirs, files in os.walk(directory):
         dirs[:] = [d for d in dirs if d not in ignore_dirs]
+        top_level = os.path.relpath(root, directory).split(os.sep, 1)[0]
 
         for filename in files:
             if not filename.endswith('.py'):
                 continue
 
+            if top_level in potential_packages:
+                pkg_py_counts[top_level] += 1
+
             filepath = os.path.join(root, filename)
             abs_imports, _ = parse_imports(filepath)
 
@@ -220,25 +269,53 @@ def auto_detect_root_package(
     if import_counts:
         return import_counts.most_common(1)[0][0]
 
-    # Fallback: return largest potential package
-    if potential_packages:
-        pkg_sizes = {}
-        for pkg in potential_packages:
-            pkg_path = Path(directory) / pkg
-            try:
-                pkg_sizes[pkg] = sum(1 for _ in pkg_path.rglob("*.py"))
-            except Exception:
-                pkg_sizes[pkg] = 0
-        if pkg_sizes:
-            return max(pkg_sizes, key=pkg_sizes.get)
-
-    return None
+    # Fallback: return largest potential package (ties broken by name)
+    return max(sorted(potential_packages), key=lambda pkg: pkg_py_counts[pkg])
 
 
 # =============================================================================
 # Dependency Graph Building
 # =============================================================================
 
+def _dotted_prefixes(name: str):
+    """Every ``p`` with ``name.startswith(p + ".")``, shortest first."""
+    i = name.find(".")
+    while i != -1:
+        yield name[:i]
+        i = name.find(".", i + 1)
+
+
+def _first_module_under_prefix(modules: Dict[str, Any]) -> Dict[str, Tuple[int, str]]:
+    """Map each dotted package prefix to the first module (in order) beneath it."""
+    index: Dict[str, Tuple[int, str]] = {}
+    for i, mod_name in enumerate(modules):
+        for prefix in _dotted_prefixes(mod_name):
+            index.setdefault(prefix, (i, mod_name))
+    return index
+
+
+def _match_by_package(
+    imp: str,
+    modules: Dict[str, Any],
+    module_order: Dict[str, int],
+    first_under_prefix: Dict[str, Tuple[int, str]]
+) -> Optional[str]:
+    """
+    First module, in ``modules`` order, that lives under ``imp`` (``imp`` is a
+    package) or that ``imp`` lives under (``imp`` names a member of it).
+
+    Equivalent to scanning every module for ``m.startswith(imp + ".") or
+    imp.startswith(m + ".")``, but costs one lookup per dotted level of ``imp``.
+    """
+    best = first_under_prefix.get(imp)
+    for parent in _dotted_prefixes(imp):
+        if parent in modules:
+            order = module_order[parent]
+            if best is None or order < best[0]:
+                best = (order, parent)
+    return best[1] if best else None
+
+
 def build_import_graph(
     files: List[str],
     root_dir: str,
@@ -258,7 +335,8 @@ def build_import_graph(
             "internal_edges": [(from, to), ...],
             "external_deps": {module: [external_imports]},
             "circular": [(a, b), ...],
-            "aliases": {alias: module}  # NEW: Global alias map
+            "aliases": {alias: module},  # NEW: Global alias map
+            "adjacency": {module_name: (imported, ...)}  # Read-only view of imports
         }
     """
     # First pass: discover all modules
@@ -286,12 +364,18 @@ def build_import_graph(
         leaf = mod_name.split(".")[-1]
         leaf_to_modules[leaf].append(mod_name)
 
+    # Package-prefix lookups for imports that name a package or a member
+    module_order = {mod_name: i for i, mod_name in enumerate(modules)}
+    first_under_prefix = _first_module_under_prefix(modules)
+
     # Second pass: analyze imports
     internal_edges = []
     external_deps = defaultdict(set)
 
     for module_name, info in modules.items():
         import_data = parse_imports_with_aliases(info["file"])
+        # Mirrors info["imports"] for O(1) dedup; the list keeps first-seen order
+        seen_targets = set()
 
         # Collect aliases
         for alias, full_name in import_data["aliases"].items():
@@ -306,10 +390,7 @@ def build_import_graph(
             if imp in modules:
                 target = imp
             else:
-                for known_module in modules:
-                    if known_module.startswith(f"{imp}.") or imp.startswith(f"{known_module}."):
-                        target = known_module
-                        break
+                target = _match_by_package(imp, modules, module_order, first_under_prefix)
 
             if not target and base in leaf_to_modules:
                 candidates = leaf_to_modules[base]
@@ -325,7 +406,8 @@ def build_import_graph(
                         target = candidates[0]
 
             if target and target != module_name:
-                if target not in info["imports"]:
+                if target not in seen_targets:
+                    seen_targets.add(target)
                     info["imports"].append(target)
                     modules[target]["imported_by"].append(module_name)
                     internal_edges.append((module_name, target))
@@ -340,26 +422,27 @@ def build_import_graph(
                 target = ".".join(target.split(".")[:-1])
 
             if target and target != module_name:
-                if target not in info["imports"]:
+                if target not in seen_targets:
+                    seen_targets.add(target)
                     info["imports"].append(target)
                     modules[target]["imported_by"].append(module_name)
                     internal_edges.append((module_name, target))
 
-    # Find circular dependencies
-    circular = []
-    seen_pairs = set()
-    for a, b in internal_edges:
-        if (b, a) in seen_pairs:
-            circular.append((min(a, b), max(a, b)))
-        seen_pairs.add((a, b))
-    circular = list(set(circular))
+    # Find circular dependencies: pairs with an edge in both directions
+    edge_set = set(internal_edges)
+    circular = sorted({
+        (a, b) if a < b else (b, a)
+        for a, b in internal_edges
+        if (b, a) in edge_set
+    })
 
     return {
         "modules": modules,
         "internal_edges": internal_edges,
         "external_deps": {k: list(v) for k, v in external_deps.items()},
         "circular": circular,
-        "aliases": global_aliases
+        "aliases": global_aliases,
+        "adjacency": {name: tuple(info["imports"]) for name, info in modules.items()}
     }
 
 
@@ -367,15 +450,66 @@ def build_import_graph(
 # Dependency Distance Calculation (NEW - Codegraph Feature)
 # =============================================================================
 
+def _component_ids(nodes, adjacency: Dict[str, Tuple[str, ...]]) -> Dict[str, int]:
+    """
+    Strongly connected component id per node (iterative Tarjan).
+
+    Two modules share an id exactly when each can reach the other.
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    stack: List[str] = []
+    component: Dict[str, int] = {}
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(adjacency.get(root, ())))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(adjacency.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    comp_id = index[node]
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component[member] = comp_id
+                        if member == node:
+                            break
+    return component
+
+
 def calculate_dependency_distance(graph: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calculate dependency distance (hops) between modules using BFS.
 
+    Depth statistics are accumulated during each BFS instead of storing
+    every pair's distance and path, so memory stays linear in the graph.
+
     Returns:
         {
             "max_depth": int,
             "avg_depth": float,
-            "distances": {(from, to): {"hops": int, "path": [modules]}},
             "tightly_coupled": [{"file_a": str, "file_b": str, "bidirectional": bool}],
             "hub_modules": [{"module": str, "connections": int}]  # Most connected
         }
@@ -386,74 +520,85 @@ def calculate_dependency_distance(graph: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "max_depth": 0,
             "avg_depth": 0.0,
-            "distances": {},
             "tightly_coupled": [],
             "hub_modules": []
         }
 
-    # Build adjacency list
-    adjacency = defaultdict(set)
-    for module_name, info in modules.items():
-        for imported in info["imports"]:
-            adjacency[module_name].add(imported)
-
-    # Calculate distances using BFS from each module
-    all_distances = {}
-    all_depths = []
-
-    for start_module in modules:
-        distances = {start_module: 0}
-        queue = deque([start_module])
-        paths = {start_module: [start_module]}
-
-        while queue:
-            current = queue.popleft()
-            current_dist = distances[current]
-
-            for neighbor in adjacency[current]:
-                if neighbor not in distances:
-                    distances[neighbor] = current_dist + 1
-                    paths[neighbor] = paths[current] + [neighbor]
-                    queue.append(neighbor)
-
-        # Store distances from this module
-        for end_module, dist in distances.items():
-            if dist > 0:
-                all_distances[(start_module, end_module)] = {
-                    "hops": dist,
-                    "path": paths[end_module]
-                }
-                all_depths.append(dist)
-
-    # Find tightly coupled modules (bidirectional with short distance)
+    # Prebuilt by build_import_graph; imports are already deduplicated, and
+    # tuples keep BFS order (and so tightly_coupled) independent of hashing
+    adjacency = graph.get("adjacency")
+    if adjacency is None:
+        adjacency = {name: tuple(info["imports"]) for name, info in modules.items()}
+
+    # Modules in one strongly connected component reach each other, which
+    # is the "bidirectional" test for tightly coupled pairs
+    component = _component_ids(modules, adjacency)
+
+    # BFS over integer ids: adjacency as lists of ints, and a per-node stamp
+    # of the last source that reached it, so no per-source dict is built
+    names = list(modules)
+    ids = {name: i for i, name in enumerate(names)}
+    adj = [[ids[t] for t in adjacency.get(name, ())] for name in names]
+    comp = [component[name] for name in names]
+    seen = [-1] * len(names)
+
+    max_depth = 0
+    depth_sum = 0
+    depth_count = 0
     tightly_coupled = []
-    for (a, b), info in all_distances.items():
-        if info["hops"] <= 2 and (b, a) in all_distances:
-            if a < b:  # Avoid duplicates
-                tightly_coupled.append({
-                    "file_a": a,
-                    "file_b": b,
-                    "bidirectional": True,
-                    "distance": info["hops"]
-                })
-
-    # Find hub modules (most connections)
-    connection_counts = Counter()
-    for module_name, info in modules.items():
-        total_connections = len(info["imports"]) + len(info["imported_by"])
-        connection_counts[module_name] = total_connections
 
+    for start in range(len(names)):
+        seen[start] = start
+        start_module = names[start]
+        start_component = comp[start]
+        frontier = [start]
+        depth = 0
+
+        # Level-synchronous BFS: same discovery order as a FIFO queue
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for current in frontier:
+                for neighbor in adj[current]:
+                    if seen[neighbor] != start:
+                        seen[neighbor] = start
+                        next_frontier.append(neighbor)
+
+                        # Tightly coupled: reachable both ways, within 2 hops this way
+                        if (depth <= 2 and len(tightly_coupled) < 10
+                                and comp[neighbor] == start_component
+                                and start_module < names[neighbor]):
+                            tightly_coupled.append({
+                                "file_a": start_module,
+                                "file_b": names[neighbor],
+                                "bidirectional": True,
+                                "distance": depth
+                            })
+            if next_frontier:
+                depth_sum += depth * len(next_frontier)
+                depth_count += len(next_frontier)
+                if depth > max_depth:
+                    max_depth = depth
+            frontier = next_frontier
+
+    # Find hub modules (most connections); nlargest keeps module order on ties
+    connection_counts = (
+        (module_name, len(info["imports"]) + len(info["imported_by"]))
+        for module_name, info in modules.items()
+    )
     hub_modules = [
         {"module": mod, "connections": count}
-        for mod, count in connection_counts.most_common(10)
-        if count > 0
+        for mod, count in heapq.nlargest(
+            10,
+            ((mod, count) for mod, count in connection_counts if count > 0),
+            key=lambda item: item[1],
+        )
     ]
 
     return {
-        "max_depth": max(all_depths) if all_depths else 0,
-        "avg_depth": round(sum(all_depths) / len(all_depths), 2) if all_depths else 0.0,
-        "distances": all_distances,
-        "tightly_coupled": tightly_coupled[:10],  # Top 10
+        "max_depth": max_depth,
+        "avg_depth": round(depth_sum / depth_count, 2) if depth_count else 0.0,
+        "tightly_coupled": tightly_coupled,  # First 10
         "hub_modules": hub_modules
     }
 
@@ -468,7 +613,8 @@ def analyze_alias_usage(files: List[str]) -> Dict[str, Any]:
 
     Returns:
         {
-            "aliases": [{"alias": "pd", "module": "pandas", "usage_count": 47, "files": [...]}],
+            "aliases": [{"alias": "pd", "module": "pandas", "usage_count": 47,
+                         "files": [...]}],  # first ALIAS_SAMPLE_FILES files only
             "most_used": [{"alias": str, "count": int}],
             "common_patterns": {"pd": "pandas", "np": "numpy", ...}
         }
@@ -479,9 +625,11 @@ def analyze_alias_usage(files: List[str]) -> Dict[str, Any]:
         import_data = parse_imports_with_aliases(filepath)
 
         for alias, module in import_data["aliases"].items():
-            alias_usage[alias]["module"] = module
-            alias_usage[alias]["files"].append(filepath)
-            alias_usage[alias]["count"] += 1
+            data = alias_usage[alias]
+            data["module"] = module
+            if len(data["files"]) < ALIAS_SAMPLE_FILES:
+                data["files"].append(filepath)
+            data["count"] += 1
 
     # Convert to list and sort by usage
     aliases = [
@@ -526,16 +674,19 @@ def identify_layers(graph: Dict[str, Any]) -> Dict[str, List[str]]:
         "leaf": []
     }
 
+    importer_counts = {}
+
     for name, info in modules.items():
         imported_by_count = len(info["imported_by"])
         imports_count = len(info["imports"])
         ratio = imported_by_count / (imports_count + 1)
+        importer_counts[name] = imported_by_count
 
         module_lower = name.lower()
 
-        if any(kw in module_lower for kw in ORCHESTRATION_KEYWORDS):
+        if _ORCHESTRATION_RE.search(module_lower):
             layers["orchestration"].append(name)
-        elif any(kw in module_lower for kw in FOUNDATION_KEYWORDS):
+        elif _FOUNDATION_RE.search(module_lower):
             layers["foundation"].append(name)
         elif imported_by_count == 0 and imports_count == 0:
             layers["leaf"].append(name)
@@ -548,10 +699,7 @@ def identify_layers(graph: Dict[str, Any]) -> Dict[str, List[str]]:
 
     # Sort by import count within each layer
     for layer in layers:
-        layers[layer].sort(
-            key=lambda x: len(modules.get(x, {}).get("imported_by", [])),
-            reverse=True
-        )
+        layers[layer].sort(key=lambda x: importer_counts[x], reverse=True)
 
     return layers
 
@@ -571,12 +719,8 @@ def is_entry_point(filepath: str) -> bool:
     if filename.endswith("_test.py"):
         return True
 
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return 'if __name__ ==' in content or "if __name__==" in content
-    except Exception:
-        return False
+    # Reuses the memoized import parse, which has already read the file
+    return parse_imports_with_aliases(filepath)["has_main_guard"]
 
 
 def find_orphans(graph: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -590,15 +734,17 @@ def find_orphans(graph: Dict[str, Any]) -> List[Dict[str, Any]]:
             if is_entry_point(filepath):
                 continue
 
-            filename = os.path.basename(filepath).lower()
+            path_lower = filepath.lower()
             confidence = 0.9
 
-            if "script" in filepath.lower():
+            if "script" in path_lower:
                 confidence = 0.6
-            elif any(kw in filename for kw in ["deprecated", "legacy", "old"]):
-                confidence = 0.95
-            elif any(kw in filename for kw in ["util", "helper"]):
-                confidence = 0.7
+            else:
+                filename = os.path.basename(path_lower)
+                for keywords, keyword_confidence in ORPHAN_FILENAME_CONFIDENCE:
+                    if any(kw in filename for kw in keywords):
+                        confidence = keyword_confidence
+                        break
 
             orphans.append({
                 "file": filepath,
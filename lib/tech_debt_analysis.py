@@ -14,6 +14,7 @@ Usage:
 """
 
 import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List
 
@@ -29,6 +30,31 @@ DEPRECATION_PATTERNS = [
     (r'DeprecationWarning', 'warning'),
 ]
 
+# Whole-file forms of the patterns above. Scanning the full text with one
+# MULTILINE regex keeps the loop inside the regex engine; whitespace classes
+# exclude '\n' so a match never runs past the end of its line.
+_TODO_RE = re.compile(
+    r'#[^\S\n]*(TODO|FIXME|HACK|XXX|BUG|OPTIMIZE)\b(?::|[^\S\n])*(.*)$',
+    re.IGNORECASE | re.MULTILINE,
+)
+_DEPRECATION_RES = [
+    (re.compile(pattern, re.IGNORECASE), source_type)
+    for pattern, source_type in DEPRECATION_PATTERNS
+]
+# Every deprecation pattern contains "deprecat", so only those lines are checked
+_DEPRECATION_LINE_RE = re.compile(r'^.*deprecat.*$', re.IGNORECASE | re.MULTILINE)
+
+
+def _with_line_numbers(text: str, matches):
+    """Yield (line_num, match) for matches in ascending position order."""
+    line_num = 1
+    pos = 0
+    for match in matches:
+        start = match.start()
+        line_num += text.count('\n', pos, start)
+        pos = start
+        yield line_num, match
+
 
 def analyze_tech_debt(
     files: List[str],
@@ -57,8 +83,6 @@ def analyze_tech_debt(
             }
         }
     """
-    import sys
-
     if verbose:
         print("Analyzing technical debt markers...", file=sys.stderr)
 
@@ -77,48 +101,44 @@ def analyze_tech_debt(
     for filepath in files:
         try:
             with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-                file_markers = []
-
-                for line_num, line in enumerate(f, 1):
-                    for pattern in TODO_PATTERNS:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            marker_type = match.group(1).upper()
-                            text = match.group(2).strip()[:80]  # Limit length
-
-                            if marker_type in markers:
-                                entry = {
-                                    'file': filepath,
-                                    'line': line_num,
-                                    'text': text
-                                }
-                                markers[marker_type].append(entry)
-
-                                file_markers.append({
-                                    'type': marker_type,
-                                    'line': line_num,
-                                    'text': text
-                                })
-
-                    # Deprecation detection
-                    for dep_pattern, source_type in DEPRECATION_PATTERNS:
-                        dep_match = re.search(dep_pattern, line, re.IGNORECASE)
-                        if dep_match:
-                            text = dep_match.group(0).strip()[:80]
-                            deprecations.append({
-                                'file': filepath,
-                                'line': line_num,
-                                'text': text,
-                                'source': source_type,
-                            })
-                            break  # one deprecation match per line
-
-                if file_markers:
-                    by_file[filepath] = file_markers
-
+                text = f.read()
         except Exception:
             continue
 
+        file_markers = []
+        for line_num, match in _with_line_numbers(text, _TODO_RE.finditer(text)):
+            marker_type = match.group(1).upper()
+            text_snippet = match.group(2).strip()[:80]  # Limit length
+
+            if marker_type in markers:
+                markers[marker_type].append({
+                    'file': filepath,
+                    'line': line_num,
+                    'text': text_snippet
+                })
+                file_markers.append({
+                    'type': marker_type,
+                    'line': line_num,
+                    'text': text_snippet
+                })
+
+        if file_markers:
+            by_file[filepath] = file_markers
+
+        # Deprecation detection
+        for line_num, line_match in _with_line_numbers(text, _DEPRECATION_LINE_RE.finditer(text)):
+            line = line_match.group(0)
+            for dep_re, source_type in _DEPRECATION_RES:
+                dep_match = dep_re.search(line)
+                if dep_match:
+                    deprecations.append({
+                        'file': filepath,
+                        'line': line_num,
+                        'text': dep_match.group(0).strip()[:80],
+                        'source': source_type,
+                    })
+                    break  # one deprecation match per line
+
     # Calculate summary
     total_count = sum(len(v) for v in markers.values())
     by_type = {k: len(v) for k, v in markers.items() if v}
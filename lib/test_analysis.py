@@ -14,9 +14,14 @@ Usage:
     result = analyze_tests(directory, source_modules)
 """
 
+import functools
+import heapq
+import itertools
+import os
 import re
+import sys
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 # Common test directory names
 TEST_DIRS = ["tests", "test", "testing"]
@@ -27,14 +32,19 @@ TEST_FILE_PATTERNS = [
     r"^.*_test\.py$",
     r"^tests?\.py$",
 ]
+# One alternation so a filename is matched in a single regex call
+_TEST_FILE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in TEST_FILE_PATTERNS))
+
+_TEST_FUNC_RE = re.compile(r'^\s*(?:async\s+)?def\s+test_', re.MULTILINE)
+
+# @pytest.fixture / @fixture decorated functions, possibly with more decorators between
+_PYTEST_FIXTURE_RE = re.compile(r'@pytest\.fixture[^\n]*\n(?:\s*@[^\n]+\n)*\s*def\s+(\w+)')
+_SIMPLE_FIXTURE_RE = re.compile(r'@fixture[^\n]*\n(?:\s*@[^\n]+\n)*\s*def\s+(\w+)')
 
 
 def is_test_file(filename: str) -> bool:
     """Check if a file is a test file based on naming patterns."""
-    for pattern in TEST_FILE_PATTERNS:
-        if re.match(pattern, filename):
-            return True
-    return False
+    return _TEST_FILE_RE.match(filename) is not None
 
 
 def count_test_functions(filepath: str) -> int:
@@ -43,55 +53,110 @@ def count_test_functions(filepath: str) -> int:
 
     Looks for functions starting with 'test_' or decorated with @pytest.mark.
     """
+    content = _read_text(filepath)
+    return _count_test_functions_in(content) if content is not None else 0
+
+
+def extract_fixtures(conftest_path: str) -> List[str]:
+    """Extract fixture names from a conftest.py file."""
+    content = _read_text(conftest_path)
+    return list(_extract_fixtures_from(content)) if content is not None else []
+
+
+def _read_text(filepath: str) -> Optional[str]:
+    """File contents (undecodable bytes replaced), or None if unreadable."""
     try:
         with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
+            return f.read()
+    except Exception:
+        return None
 
-        # Count def test_ patterns
-        test_count = len(re.findall(r'^\s*(?:async\s+)?def\s+test_', content, re.MULTILINE))
 
-        return test_count
-    except Exception:
-        return 0
+def _read_if_short(filepath: str, max_lines: int) -> Optional[str]:
+    """
+    File contents if they span at most max_lines lines, else None.
 
+    Lines are counted as content.count("\\n") + 1. Reading stops after
+    max_lines lines, so long files are rejected without being read in full.
+    """
+    if max_lines <= 0:
+        return None
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        head = list(itertools.islice(f, max_lines))
+    if len(head) == max_lines and head[-1].endswith("\n"):
+        return None
+    return "".join(head)
 
-def extract_fixtures(conftest_path: str) -> List[str]:
-    """Extract fixture names from a conftest.py file."""
-    try:
-        content = Path(conftest_path).read_text(encoding='utf-8', errors='replace')
 
-        fixtures = []
+def _count_test_functions_in(content: str) -> int:
+    """Count def test_ patterns in already-read source text."""
+    return len(_TEST_FUNC_RE.findall(content))
 
-        # Find @pytest.fixture decorated functions
-        fixture_matches = re.findall(
-            r'@pytest\.fixture[^\n]*\n(?:\s*@[^\n]+\n)*\s*def\s+(\w+)',
-            content
-        )
-        fixtures.extend(fixture_matches)
 
-        # Find simple @fixture pattern
-        simple_matches = re.findall(
-            r'@fixture[^\n]*\n(?:\s*@[^\n]+\n)*\s*def\s+(\w+)',
-            content
-        )
-        fixtures.extend(simple_matches)
+def _extract_fixtures_from(content: str) -> Set[str]:
+    """Fixture names declared in already-read conftest source text."""
+    # Find @pytest.fixture decorated functions
+    fixtures = set(_PYTEST_FIXTURE_RE.findall(content))
 
-        return list(set(fixtures))  # Deduplicate
-    except Exception:
-        return []
+    # Find simple @fixture pattern
+    fixtures.update(_SIMPLE_FIXTURE_RE.findall(content))
+
+    return fixtures
+
+
+def _walk_py_files(test_dir: Path, root: Path):
+    """
+    Yield (path, path relative to root, name) for every *.py entry under test_dir.
+
+    Same entries and order as test_dir.rglob("*.py") (each directory's
+    matches, then its subdirectories depth-first; symlinked directories are
+    not followed), but one os.scandir per directory and no Path objects.
+    """
+    stack = [(str(test_dir), str(test_dir.relative_to(root)))]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if os.path.normcase(name).endswith(".py"):
+                yield entry.path, os.path.join(rel_dir, name), name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, os.path.join(rel_dir, name)))
+            except OSError:
+                pass
+        stack.extend(reversed(subdirs))
 
 
 def find_test_directories(root_dir: str) -> List[Path]:
     """Find all test directories in the project."""
-    root = Path(root_dir)
-    test_dirs = []
+    try:
+        st = os.stat(root_dir)
+    except OSError:
+        return []
+    return list(_find_test_directories_cached(root_dir, st.st_mtime_ns))
 
-    for test_dir_name in TEST_DIRS:
-        test_path = root / test_dir_name
-        if test_path.exists() and test_path.is_dir():
-            test_dirs.append(test_path)
 
-    return test_dirs
+@functools.lru_cache(maxsize=32)
+def _find_test_directories_cached(root_dir: str, mtime_ns: int) -> Tuple[Path, ...]:
+    """
+    find_test_directories memo, shared by analyze_tests and get_test_example.
+
+    Adding or removing a top-level directory changes root_dir's mtime, which
+    invalidates the entry.
+    """
+    root = Path(root_dir)
+    return tuple(
+        test_path
+        for test_path in (root / name for name in TEST_DIRS)
+        if test_path.is_dir()
+    )
 
 
 def analyze_tests(
@@ -119,14 +184,13 @@ def analyze_tests(
             "conftest_files": [str]
         }
     """
-    import sys
-
     if verbose:
         print("Analyzing test coverage...", file=sys.stderr)
 
     root = Path(directory)
     test_files = []
-    fixtures = []
+    test_file_parts = []  # rel_path components, parallel to test_files
+    fixtures: Set[str] = set()
     conftest_files = []
     total_test_functions = 0
 
@@ -147,31 +211,33 @@ def analyze_tests(
 
     # Collect test files from test directories
     for test_dir in test_dirs:
-        for py_file in test_dir.rglob("*.py"):
-            rel_path = str(py_file.relative_to(root))
+        for py_path, rel_path, name in _walk_py_files(test_dir, root):
+            # Read once; the test count and conftest fixtures share the text
+            content = _read_text(py_path)
 
             # Count test functions
-            test_count = count_test_functions(str(py_file))
+            test_count = _count_test_functions_in(content) if content is not None else 0
             total_test_functions += test_count
 
             test_files.append({
                 "path": rel_path,
                 "tests": test_count
             })
+            # rel_path is joined from clean components, so splitting on os.sep
+            # gives Path(rel_path).parts without building a Path
+            test_file_parts.append(rel_path.split(os.sep))
 
             # Extract fixtures from conftest.py
-            if py_file.name == "conftest.py":
+            if name == "conftest.py":
                 conftest_files.append(rel_path)
-                file_fixtures = extract_fixtures(str(py_file))
-                fixtures.extend(file_fixtures)
+                if content is not None:
+                    fixtures.update(_extract_fixtures_from(content))
 
     # Analyze coverage by test type
     coverage_by_type = {}
     tested_source_dirs: Set[str] = set()
 
-    for test_file in test_files:
-        parts = Path(test_file["path"]).parts
-
+    for parts in test_file_parts:
         if len(parts) >= 2:
             # First level after tests/ is the test type
             test_type = parts[1]
@@ -209,10 +275,10 @@ def analyze_tests(
         "test_file_count": len(test_files),
         "test_function_count": total_test_functions,
         "coverage_by_type": coverage_by_type,
-        "tested_dirs": sorted(list(tested_source_dirs)),
-        "untested_dirs": sorted(list(untested_dirs))[:10],
-        "fixtures": sorted(list(set(fixtures)))[:20],
-        "test_files": sorted(test_files, key=lambda x: x["tests"], reverse=True)[:20],
+        "tested_dirs": sorted(tested_source_dirs),
+        "untested_dirs": sorted(untested_dirs)[:10],
+        "fixtures": sorted(fixtures)[:20],
+        "test_files": heapq.nlargest(20, test_files, key=lambda x: x["tests"]),
         "conftest_files": conftest_files
     }
 
@@ -240,7 +306,8 @@ def _detect_mocking_patterns(content: str) -> List[str]:
     """
     Detect mocking patterns used in a test file.
 
-    Returns list of detected patterns.
+    Returns list of detected patterns, in check order (each label is
+    appended at most once, so no deduplication is needed).
     """
     patterns = []
 
@@ -278,7 +345,7 @@ def _detect_mocking_patterns(content: str) -> List[str]:
     if "@pytest.mark.asyncio" in content:
         patterns.append("pytest-asyncio")
 
-    return list(set(patterns))
+    return patterns
 
 
 def _score_test_file(filepath: str, content: str, line_count: int) -> int:
@@ -360,60 +427,48 @@ def get_test_example(
     if not test_dirs:
         return None
 
-    candidates = []
+    # Keep only the best-scoring file so far (first one wins ties); mocking
+    # patterns are detected for the winner only
+    best = None
+    best_score = 0
 
     for test_dir in test_dirs:
-        for py_file in test_dir.rglob("*.py"):
+        for py_path, rel_path, name in _walk_py_files(test_dir, root):
             # Skip conftest.py files
-            if py_file.name == "conftest.py":
+            if name == "conftest.py":
                 continue
 
             # Skip __init__.py
-            if py_file.name == "__init__.py":
+            if name == "__init__.py":
                 continue
 
             # Skip non-test files
-            if not is_test_file(py_file.name):
+            if not is_test_file(name):
                 continue
 
             try:
-                content = py_file.read_text(encoding="utf-8", errors="replace")
-                lines = content.split("\n")
-                line_count = len(lines)
-
-                # Skip files over max_lines
-                if line_count > max_lines:
+                # Skip files over max_lines without reading past them
+                content = _read_if_short(py_path, max_lines)
+                if content is None:
                     continue
+                line_count = content.count("\n") + 1
 
                 # Score the file
-                score = _score_test_file(str(py_file), content, line_count)
-
-                if score > 0:
-                    rel_path = str(py_file.relative_to(root))
-                    patterns = _detect_mocking_patterns(content)
+                score = _score_test_file(py_path, content, line_count)
 
-                    candidates.append({
+                if score > best_score:
+                    best_score = score
+                    best = {
                         "file": rel_path,
                         "content": content,
                         "line_count": line_count,
-                        "patterns": patterns,
-                        "score": score
-                    })
+                    }
 
             except (IOError, OSError):
                 continue
 
-    if not candidates:
+    if best is None:
         return None
 
-    # Sort by score descending
-    candidates.sort(key=lambda x: x["score"], reverse=True)
-
-    # Return the best candidate (without the internal score)
-    best = candidates[0]
-    return {
-        "file": best["file"],
-        "content": best["content"],
-        "line_count": best["line_count"],
-        "patterns": best["patterns"]
-    }
+    best["patterns"] = _detect_mocking_patterns(best["content"])
+    return best
@@ -4,6 +4,7 @@ Unit tests for gap_features.py
 Tests the gap analysis features that enhance repo-xray output.
 """
 
+import ast
 import sys
 from pathlib import Path
 
@@ -29,10 +30,19 @@ from gap_features import (
     get_maintenance_hotspots,
     _extract_class_docstring,
     _extract_init_signature,
+    _extract_instance_vars,
+    _extract_class_info,
+    _annotation_text,
     _extract_function_docstring,
     _generate_heuristic_summary,
+    generate_logic_maps,
+    extract_state_mutations,
+    _parse_file_cached,
+    _base_bonus,
     find_agent_prompts,
+    get_directory_hazards,
 )
+import ast_cache
 
 
 # =============================================================================
@@ -235,6 +245,23 @@ class TestCalculatePriorityScores:
         for r in result:
             assert 0 <= r["score"] <= 1
 
+    def test_most_called_resolves_dotted_module_to_file(self):
+        """Dotted call targets should credit the matching file's import weight."""
+        results = {
+            "hotspots": [
+                {"file": "/project/core/main.py", "complexity": 5},
+                {"file": "/project/core/utils.py", "complexity": 5},
+            ],
+            "calls": {
+                "most_called": [{"function": "core.utils.helper", "call_sites": 40}],
+            },
+        }
+        result = calculate_priority_scores(results)
+
+        by_name = {Path(r["file"]).name: r for r in result}
+        assert "many callers" in by_name["utils.py"]["reasons"]
+        assert "many callers" not in by_name["main.py"]["reasons"]
+
 
 # =============================================================================
 # Test generate_mermaid_diagram
@@ -385,6 +412,18 @@ class TestExtractDataModels:
         data_model = next(m for m in models if m["name"] == "DataModel")
         assert len(data_model["fields"]) > 0
 
+    def test_domain_assigned_by_rule_order(self, results_with_classes):
+        """Domain rules apply in order, falling back to the parent directory."""
+        results_with_classes["structure"]["files"]["/project/misc/things.py"] = {
+            "classes": [{"name": "Thing", "bases": ["BaseModel"], "decorators": []}]
+        }
+        models = extract_data_models(results_with_classes)
+        domains = {m["name"]: m["domain"] for m in models}
+
+        assert domains["DataModel"] == "Models"
+        assert domains["Config"] == "Config"
+        assert domains["Thing"] == "Misc"
+
 
 # =============================================================================
 # Test get_layer_details
@@ -460,6 +499,22 @@ class TestVerifyImports:
         assert "broken" in verification
         assert "warnings" in verification
 
+    def test_unknown_imports_become_warnings(self):
+        """Imports that are neither internal nor declared deps are warned about."""
+        results = {
+            "imports": {
+                "external_deps": ["requests"],
+                "graph": {
+                    "app.main": {"imports": ["app.util", "requests", "ghost"]},
+                    "app.util": ["os_helpers"],
+                },
+            }
+        }
+        verification = verify_imports(results, "/project")
+
+        assert verification["passed"] == 2
+        assert [w["import"] for w in verification["warnings"]] == ["ghost", "os_helpers"]
+
 
 # =============================================================================
 # Test generate_prose
@@ -565,6 +620,12 @@ class TestFormatInlineSkeletons:
         for skeleton in skeletons:
             assert "line" in skeleton
 
+    def test_base_bonus_uses_first_listed_pattern(self):
+        """A base's bonus comes from the first IMPORTANT_BASES pattern it contains."""
+        assert _base_bonus("pydantic.BaseModel") == 20
+        assert _base_bonus("HandlerABC") == 10  # "Handler" is listed before "ABC"
+        assert _base_bonus("object") == 0
+
 
 # =============================================================================
 # Test normalize_values
@@ -640,6 +701,13 @@ class TestGetArchitecturalPillars:
             assert "imported_by" in r
             assert isinstance(r["imported_by"], list)
 
+    def test_resolves_module_to_filepath(self, results_with_classes):
+        """Dotted module names should map to their source file path."""
+        result = get_architectural_pillars(results_with_classes, n=5)
+
+        assert result[0]["module"] == "project.agents.base"
+        assert result[0]["file"] == "/project/agents/base.py"
+
 
 # =============================================================================
 # Test get_maintenance_hotspots
@@ -717,6 +785,24 @@ class MyClass:
         result = _extract_class_docstring(str(filepath), "MyClass", 2)
         assert result is None
 
+    def test_finds_nested_class(self, tmp_path):
+        """Classes nested in functions or classes are still found."""
+        source = '''
+class Outer:
+    class Inner:
+        """Inner helper. More."""
+
+def factory():
+    class Local:
+        """Local class."""
+    return Local
+'''
+        filepath = tmp_path / "nested.py"
+        filepath.write_text(source)
+
+        assert _extract_class_docstring(str(filepath), "Inner", 0) == "Inner helper."
+        assert _extract_class_docstring(str(filepath), "Local", 0) == "Local class."
+
     def test_handles_file_not_found(self):
         """Should handle file not found gracefully."""
         result = _extract_class_docstring("/nonexistent/path.py", "MyClass", 1)
@@ -784,6 +870,61 @@ class MyClass:
         # Should be a valid __init__ signature
         assert "def __init__(self," in result
 
+    def test_shares_parse_with_docstring_extraction(self, tmp_path):
+        """Docstring, __init__ and instance-var lookups for every class reuse one parse."""
+        source = '''
+class First:
+    """First class."""
+    def __init__(self, a: int):
+        self.a = a
+
+class Second:
+    """Second class."""
+    def __init__(self, b: str):
+        self.b = b
+'''
+        filepath = tmp_path / "multi.py"
+        filepath.write_text(source)
+        _parse_file_cached.cache_clear()
+
+        for cls_name in ("First", "Second"):
+            assert _extract_class_docstring(str(filepath), cls_name, 0)
+            assert _extract_init_signature(str(filepath), cls_name)
+            assert len(_extract_instance_vars(str(filepath), cls_name)) == 1
+
+        assert _parse_file_cached.cache_info().misses == 1
+
+    def test_annotation_text_matches_unparse(self):
+        """The fast annotation formatter agrees with ast.unparse."""
+        for text in ("int", "typing.Optional", "Dict[str, List[int]]",
+                     "Optional['Node']", "Tuple[int, ...]", "Tuple[int,]",
+                     "Callable[[int], str]", "int | None", "t.Mapping[k.K, v.V]"):
+            node = ast.parse(text, mode="eval").body
+            assert _annotation_text(node) == ast.unparse(node)
+
+    def test_class_info_matches_individual_extractors(self, tmp_path):
+        """_extract_class_info returns what the three extractors return."""
+        filepath = tmp_path / "svc.py"
+        filepath.write_text('''
+class Service:
+    """Serves requests. Extra detail."""
+    def __init__(self, port: int, *, debug: bool):
+        self.port = port
+        self.debug = debug
+
+class Bare:
+    pass
+''')
+        path = str(filepath)
+
+        assert _extract_class_info(path, "Service") == (
+            _extract_class_docstring(path, "Service", 0),
+            _extract_init_signature(path, "Service"),
+            _extract_instance_vars(path, "Service"),
+        )
+        assert _extract_class_info(path, "Bare") == (None, None, [])
+        assert _extract_class_info(path, "Missing") == (None, None, [])
+
 
 # =============================================================================
 # Test _extract_function_docstring
@@ -888,6 +1029,26 @@ def validate(x):
         # Should have multiple returns with conditionals
         assert "return" in result.lower() or "branch" in result.lower()
 
+    def test_early_return_requires_enclosing_if(self):
+        """Multiple returns outside any if-branch are not early returns."""
+        nested = '''
+def check(x):
+    for item in x:
+        if item:
+            while True:
+                return item
+    return None
+'''
+        flat = '''
+def load(path):
+    try:
+        return open(path).read()
+    except OSError:
+        return ""
+'''
+        assert "returns early on error" in _generate_heuristic_summary(nested, "check")
+        assert "returns early" not in _generate_heuristic_summary(flat, "load")
+
     def test_returns_empty_for_simple_function(self):
         """Simple functions should return empty or minimal summary."""
         source = '''
@@ -899,6 +1060,81 @@ def simple():
         assert result == "" or "single return" in result.lower()
 
 
+# =============================================================================
+# Test generate_logic_maps / extract_state_mutations
+# =============================================================================
+
+class TestHotspotFileSharing:
+    """Tests for the parse shared by hotspot-based gap features."""
+
+    def test_hotspot_file_parsed_once(self, tmp_path):
+        """Logic maps and state mutations should reuse one parse per file."""
+        filepath = tmp_path / "engine.py"
+        filepath.write_text('''
+class Engine:
+    def start(self):
+        """Start the engine."""
+        self.running = True
+        if self.ready:
+            return True
+
+    def stop(self):
+        self.running = False
+''')
+        results = {
+            "hotspots": [
+                {"file": str(filepath), "function": "start", "complexity": 5},
+                {"file": str(filepath), "function": "stop", "complexity": 3},
+            ],
+        }
+        _parse_file_cached.cache_clear()
+
+        maps = generate_logic_maps(results)
+        mutations = extract_state_mutations(results)
+
+        assert [m["method"] for m in maps] == ["start", "stop"]
+        assert maps[0]["docstring"] == "Start the engine."
+        assert mutations["engine.py:stop"] == ["self.running"]
+        assert _parse_file_cached.cache_info().misses == 1
+
+    def test_state_mutations_deduplicated_in_source_order(self, tmp_path):
+        """Repeated self.X targets appear once, ordered as first assigned."""
+        filepath = tmp_path / "engine.py"
+        filepath.write_text('''
+class Engine:
+    def run(self, items):
+        self.status = "busy"
+        for item in items:
+            if item:
+                self.last = self.seen = item
+        self.status = "idle"
+''')
+        results = {"hotspots": [{"file": str(filepath), "function": "run"}]}
+
+        mutations = extract_state_mutations(results)
+
+        assert mutations["engine.py:run"] == ["self.status", "self.last", "self.seen"]
+
+    def test_duplicate_hotspots_skip_file_reads(self, tmp_path):
+        """Same basename:function in another path should not be read at all."""
+        for sub in ("a", "b"):
+            (tmp_path / sub).mkdir()
+            (tmp_path / sub / "engine.py").write_text("def start():\n    return 1\n")
+        results = {
+            "hotspots": [
+                {"file": str(tmp_path / "a" / "engine.py"), "function": "start"},
+                {"file": str(tmp_path / "b" / "engine.py"), "function": "start"},
+                {"file": "", "function": "orphan"},
+            ],
+        }
+        _parse_file_cached.cache_clear()
+
+        maps = generate_logic_maps(results)
+
+        assert [m["file"] for m in maps] == [str(tmp_path / "a" / "engine.py")]
+        assert _parse_file_cached.cache_info().misses == 1
+
+
 # =============================================================================
 # Test find_agent_prompts
 # =============================================================================
@@ -952,6 +1188,28 @@ class HelperAgent:
         assert len(found) == 1
         assert "helpful assistant" in found[0]["summary"]
 
+    def test_finds_agent_class_attribute_prompts(self, tmp_path):
+        """Prompt attributes on Agent subclasses are reported per class."""
+        agents_dir = tmp_path / "agents"
+        agents_dir.mkdir()
+        agent_file = agents_dir / "team_agent.py"
+        agent_file.write_text('''
+class ResearchAgent(base.BaseAgent):
+    system_prompt = "You research topics thoroughly, citing sources and summarizing findings for the team in plain language."
+
+class Helper(object):
+    persona = "Not an agent class, so this attribute is only picked up as a plain module-wide constant by name."
+''')
+        results = {"structure": {"files": {str(agent_file): {"classes": []}}}}
+
+        found = find_agent_prompts(str(tmp_path), results)
+
+        by_type = {p["type"]: p for p in found}
+        assert by_type["class"]["agent"] == "Research"
+        assert by_type["class"]["source"] == "team_agent.py:ResearchAgent.system_prompt"
+        assert by_type["constant"]["agent"] == "Team Agent"
+        assert len(found) == 2
+
     def test_deduplicates_by_agent_name(self, tmp_path):
         """Should deduplicate by agent name."""
         prompts_dir = tmp_path / "prompts"
@@ -1043,6 +1301,94 @@ class TestBuildDisplayNames:
         assert result["/repo/src/foo.py"] == "foo.py"
 
 
+# =============================================================================
+# Test get_directory_hazards
+# =============================================================================
+
+class TestGetDirectoryHazards:
+    """Tests for skip-worthy directory detection."""
+
+    def test_root_nested_and_glob_hazards(self, tmp_path):
+        """Root and one-level-deep literals, root-level globs, dirs only."""
+        for d in ("build", "pkg/node_modules", "pkg/dist", "other/dist",
+                  "x.egg-info", "deep/a/.venv"):
+            (tmp_path / d).mkdir(parents=True)
+        (tmp_path / "coverage").write_text("")  # a file, not a directory
+        (tmp_path / "y.egg-info").write_text("")
+
+        hazards = get_directory_hazards(str(tmp_path))
+        found = [h["directory"].replace("\\", "/") for h in hazards]
+
+        assert found[0] == "build"
+        assert "pkg/node_modules" in found
+        assert "x.egg-info" in found
+        # dist is reported once, whichever parent lists first
+        assert sum(f.endswith("/dist") for f in found) == 1
+        assert "coverage" not in found
+        assert "y.egg-info" not in found
+        assert not any(".venv" in f for f in found)  # two levels deep
+
+    def test_missing_directory(self):
+        """A nonexistent target yields no hazards."""
+        assert get_directory_hazards("/nonexistent/xray/target") == []
+
+
+# =============================================================================
+# Test ast_cache (opt-in on-disk AST cache)
+# =============================================================================
+
+class TestAstCache:
+    """Tests for the pickle-backed AST cache used by gap features."""
+
+    SOURCE = "def f(x):\n    return x + 1\n"
+
+    def test_disabled_by_default(self, tmp_path, monkeypatch):
+        """Without XRAY_AST_CACHE=1 nothing is written."""
+        monkeypatch.delenv("XRAY_AST_CACHE", raising=False)
+        monkeypatch.setenv("XRAY_AST_CACHE_DIR", str(tmp_path))
+
+        tree = ast_cache.parse_source(self.SOURCE)
+
+        assert isinstance(tree, ast.Module)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_round_trip_through_disk(self, tmp_path, monkeypatch):
+        """A second parse of the same source is served from the pickle."""
+        monkeypatch.setenv("XRAY_AST_CACHE", "1")
+        monkeypatch.setenv("XRAY_AST_CACHE_DIR", str(tmp_path))
+
+        first = ast_cache.parse_source(self.SOURCE)
+        entries = list(tmp_path.glob("*.pkl"))
+        assert len(entries) == 1
+
+        monkeypatch.setattr(ast_cache.ast, "parse", None)  # must not be called
+        second = ast_cache.parse_source(self.SOURCE)
+
+        assert ast.dump(second) == ast.dump(first)
+
+    def test_corrupt_entry_falls_back_to_parse(self, tmp_path, monkeypatch):
+        """Unreadable cache entries are re-parsed and rewritten."""
+        monkeypatch.setenv("XRAY_AST_CACHE", "1")
+        monkeypatch.setenv("XRAY_AST_CACHE_DIR", str(tmp_path))
+        ast_cache.parse_source(self.SOURCE)
+        entry = next(tmp_path.glob("*.pkl"))
+        entry.write_bytes(b"not a pickle")
+
+        tree = ast_cache.parse_source(self.SOURCE)
+
+        assert isinstance(tree, ast.Module)
+        assert ast_cache.parse_source(self.SOURCE).body[0].name == "f"
+
+    def test_syntax_error_propagates(self, tmp_path, monkeypatch):
+        """Unparseable source raises SyntaxError and caches nothing."""
+        monkeypatch.setenv("XRAY_AST_CACHE", "1")
+        monkeypatch.setenv("XRAY_AST_CACHE_DIR", str(tmp_path))
+
+        with pytest.raises(SyntaxError):
+            ast_cache.parse_source("def broken(")
+        assert list(tmp_path.glob("*.pkl")) == []
+
+
 # =============================================================================
 # Run tests
 # =============================================================================
@@ -400,6 +400,35 @@ class TestEnvVarFallback:
 
         assert len(env_vars) == 1
 
+    def test_bare_environ_import_still_detected(self):
+        """`from os import environ` forms pass the getenv/environ pre-check."""
+        import tempfile
+        source = textwrap.dedent("""
+            from os import environ
+            TOKEN = environ.get('API_TOKEN')
+        """)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write(source)
+            f.flush()
+            from gap_features import _extract_env_vars_from_file_ast
+            env_vars = _extract_env_vars_from_file_ast(f.name)
+        os.unlink(f.name)
+
+        assert [ev["variable"] for ev in env_vars] == ["API_TOKEN"]
+
+    def test_file_without_env_access_is_empty(self):
+        """Files never mentioning getenv/environ yield nothing, even if unparseable."""
+        import tempfile
+        source = "def broken(:\n    pass\n"
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write(source)
+            f.flush()
+            from gap_features import _extract_env_vars_from_file_ast
+            env_vars = _extract_env_vars_from_file_ast(f.name)
+        os.unlink(f.name)
+
+        assert env_vars == []
+
 
 # =============================================================================
 # Enhancement 6: @deprecated Marker Scanning